@@ -18,11 +18,11 @@
 from .model import Entry, Function, Locator, Number, Resource, Scalar, Stream, Text, wrap
 from .repl import Repl
 from .scope import Scope
-from .util import CycleException, dotpy, NoSuchPathException, qualname, selectentrypoints, solo
+from .util import CycleException, dotpy, NoSuchPathException, overlaps, qualname, recordreads, selectentrypoints, solo
 from functools import partial
 from itertools import chain
 from weakref import WeakKeyDictionary
-import errno, logging, os, sys
+import errno, logging, os, sys, time
 
 log = logging.getLogger(__name__)
 ctrls = WeakKeyDictionary()
@@ -55,6 +55,40 @@ class ForeignScopeException(Exception): pass
 def _wrappathorstream(pathorstream):
     return (Stream if getattr(pathorstream, 'readable', lambda: False)() else Locator)(pathorstream)
 
+batchctrl = None # Inherited by forked workers, so that the config need not be pickled.
+
+def _batchworker(pair):
+    return batchctrl._timedprocesstemplate(pair)
+
+class TemplateBatch:
+    'Remember the paths each template read, so that after a change only the affected templates need processing again.'
+
+    def __init__(self, ctrl, pairs):
+        self.ctrl = ctrl
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.reads = {}
+
+    def processall(self):
+        for pair in self.pairs:
+            self._process(pair)
+
+    def _process(self, pair):
+        with recordreads() as reads:
+            self.ctrl.processtemplate(*pair)
+        self.reads[pair] = frozenset(reads)
+
+    def affected(self, changedpaths):
+        'Return the pairs that read anything at or under the given paths, which are relative to the ctrl.'
+        changedpaths = [tuple(self.ctrl.prefix) + tuple(path) for path in changedpaths]
+        return [pair for pair in self.pairs if pair not in self.reads or any(overlaps(p, q) for q in self.reads[pair] for p in changedpaths)]
+
+    def reprocess(self, changedpaths):
+        'Process the affected pairs again and return them.'
+        pairs = self.affected(changedpaths)
+        for pair in pairs:
+            self._process(pair)
+        return pairs
+
 class ConfigCtrl:
 
     @classmethod
@@ -113,6 +147,11 @@ class ConfigCtrl:
         s = self.scope(True)
         _wrappathorstream(pathorstream).source(s, Entry([]))
 
+    def watcher(self, *args, **kwargs):
+        'Return a Watcher, which loads files like this ctrl but also reloads them when they change.'
+        from .watch import Watcher
+        return Watcher(self, *args, **kwargs)
+
     def loadsettings(self):
         self.load(os.path.join(os.path.expanduser('~'), '.settings.arid'))
 
@@ -143,7 +182,7 @@ class ConfigCtrl:
 
     def scope(self, strict = False):
         if strict:
-            s = self.basescope.resolvedscopeornone(self.prefix)
+            s = self.basescope.resolvedscopeornone(self.prefix, True)
             if s is None:
                 raise ForeignScopeException
             return s
@@ -158,12 +197,61 @@ class ConfigCtrl:
 
     def processtemplate(self, frompathorstream, topathorstream):
         s = self.scope()
-        text = _wrappathorstream(frompathorstream).processtemplate(s)
+        template = _wrappathorstream(frompathorstream)
         if getattr(topathorstream, 'writable', lambda: False)():
-            topathorstream.write(text)
-        else:
-            with open(topathorstream, 'w') as g:
-                g.write(text)
+            template.writetemplate(s, topathorstream)
+        else: # Render to a temporary file first, so that a failed render keeps the last good output.
+            from shutil import copyfileobj
+            from tempfile import TemporaryFile
+            with TemporaryFile('w+') as g:
+                template.writetemplate(s, g)
+                g.seek(0)
+                with open(topathorstream, 'w') as h: # Through any symlink, keeping the destination's mode and owner.
+                    copyfileobj(g, h)
+
+    def processtemplates(self, pairs, workers = 0, processes = False):
+        'Process each template to its destination and return the seconds each took, using a pool of threads or forked processes if workers is given.'
+        from .grammar import parsetemplate
+        global batchctrl
+        pairs = list(pairs)
+        if not workers:
+            return [self._timedprocesstemplate(pair) for pair in pairs]
+        if not processes:
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(workers)
+            try:
+                return pool.map(self._timedprocesstemplate, pairs)
+            finally:
+                pool.close()
+                pool.join()
+        for path in set(t for t, _ in pairs): # Parse in the parent so that every worker inherits the result.
+            with open(path) as f:
+                parsetemplate(f.read())
+        import multiprocessing
+        try:
+            context = multiprocessing.get_context('fork') # Whatever the default, as workers must inherit batchctrl.
+        except AttributeError: # Python 2 always forks.
+            context = multiprocessing
+        except ValueError:
+            raise ValueError('Process workers need the fork start method, use threads on this platform.')
+        batchctrl = self
+        try:
+            pool = context.Pool(workers)
+            try:
+                return pool.map(_batchworker, pairs)
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            batchctrl = None
+
+    def templatebatch(self, pairs):
+        return TemplateBatch(self, pairs)
+
+    def _timedprocesstemplate(self, pair):
+        start = time.time()
+        self.processtemplate(*pair)
+        return time.time() - start
 
     def freectrl(self):
         return self._of(self.scope()) # XXX: Strict?
@@ -171,12 +259,21 @@ class ConfigCtrl:
     def childctrl(self):
         return self._of(self.scope(True).createchild())
 
+    def overlayctrl(self, delta):
+        'Like childctrl with the given paths (or keys) to values put in it, but cheaper to create and read when the delta is small.'
+        from .scope import OverlayScope
+        return self._of(OverlayScope(self.scope(True), [(path if tuple == type(path) else (path,), wrap(value)) for path, value in delta.items()]))
+
     def addname(self, name):
         return self._of(self.basescope, self.prefix + [name])
 
     def resolve(self):
         return self.basescope.resolved(*self.prefix)
 
+    def freeze(self):
+        'Eagerly resolve the whole tree into an immutable FrozenConfig, for read-only use after startup.'
+        return FrozenConfig.fromnodetable(FrozenConfig.nodetable(self.scope()))
+
 class Config(object):
 
     def __getattr__(self, name):
@@ -201,6 +298,72 @@ class Config(object):
     def __setattr__(self, name, value):
         ctrls[self].scope(True)[name,] = wrap(value)
 
+class FrozenConfig(object):
+    'Snapshot of a resolved scope with the same read API as Config, safe to share between threads and forked processes.'
+
+    __slots__ = '_frozenitems', '_frozendict', '_frozenislist'
+
+    @staticmethod
+    def nodetable(scope):
+        'Resolve the whole tree into a list of (islist, items) with the root first, where each item is a key (None in a list), whether the value is the index of a child node, and the value.'
+        nodes = []
+        indices = {}
+        def nodeindex(s):
+            try:
+                return indices[id(s)][0]
+            except KeyError:
+                pass
+            i = len(nodes)
+            indices[id(s)] = i, s # Keep computed scopes alive so that their ids are not reused.
+            nodes.append(None)
+            items = []
+            for k, o in s.resolveditems():
+                try:
+                    items.append((k, False, o.scalar))
+                except AttributeError:
+                    if hasattr(o, 'resolvables'):
+                        items.append((k, True, nodeindex(o)))
+            islist = s.islistof(k for k, _, _ in items)
+            nodes[i] = islist, tuple((None if islist else k, isnode, v) for k, isnode, v in items)
+            return i
+        nodeindex(scope)
+        return nodes
+
+    @classmethod
+    def fromnodetable(cls, nodes):
+        'Return the root of the given node table as a FrozenConfig.'
+        frozen = [cls() for _ in nodes]
+        for node, (islist, items) in zip(frozen, nodes):
+            node._freeze([(k, frozen[v] if isnode else v) for k, isnode, v in items], islist)
+        return frozen[0]
+
+    def _freeze(self, items, islist):
+        setslot = super(FrozenConfig, self).__setattr__
+        setslot('_frozenitems', tuple(items))
+        setslot('_frozendict', dict(items))
+        setslot('_frozenislist', islist)
+
+    def __getattr__(self, name):
+        if name.startswith('_'): # Not config, and the slots may not be set yet e.g. while copying.
+            raise AttributeError(name)
+        try:
+            return self._frozendict[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        for _, v in self._frozenitems:
+            yield v
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Frozen config is read-only: %s" % name)
+
+    def __reduce__(self):
+        return FrozenConfig, (), (self._frozenitems, self._frozenislist) # State after construction so that cycles such as TOP work.
+
+    def __setstate__(self, state):
+        self._freeze(*state)
+
 class RConfig(object):
 
     def __getattr__(self, name):
@@ -0,0 +1,203 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+'Report the most depended on paths and the deepest reference chains of config from stdin.'
+from .config import ConfigCtrl
+from .model import Call, Text
+from .scope import generation
+from .util import CycleException, resolvestate
+from argparse import ArgumentParser
+import collections, sys, time
+
+getnames = '', 'get'
+
+def _references(resolvable):
+    if isinstance(resolvable, Call):
+        yield resolvable.name,
+        args = [a for a in resolvable.args if not a.ignorable]
+        if resolvable.name in getnames and args and all(isinstance(a, Text) for a in args):
+            yield tuple(a.textvalue for a in args)
+        for a in args:
+            for path in _references(a):
+                yield path
+    for part in getattr(resolvable, 'parts', ()):
+        for path in _references(part):
+            yield path
+
+def _locate(scope, path):
+    staticscope = scope.staticscope()
+    for _, s in scope._selfandparents():
+        if s is staticscope:
+            continue
+        t = s
+        for name in path[:-1]:
+            t = t.resolvables.getornone(name)
+            if not hasattr(t, 'resolvables'):
+                break
+        else:
+            if t.resolvables.getornone(path[-1]) is not None:
+                return s.labelpath() + path
+
+def _definitions(scope):
+    definitions = collections.OrderedDict()
+    def walk(s, path):
+        for k, r in s.resolvables.items():
+            if hasattr(r, 'resolvables'):
+                walk(r, path + (k,))
+            else:
+                definitions[path + (k,)] = s, r
+    walk(scope, ())
+    return definitions
+
+def dependencies(scope):
+    'Return the static graph of every value under the given scope to the paths it references, relative to that scope.'
+    root = scope.labelpath()
+    located = collections.OrderedDict((path, [p for p in (_locate(s, q) for q in _references(r)) if p is not None]) for path, (s, r) in _definitions(scope).items())
+    graph = collections.OrderedDict()
+    for path, refs in located.items():
+        deps = collections.OrderedDict()
+        for ref in refs:
+            if ref[:len(root)] != root:
+                continue # Outside the tree.
+            ref = ref[len(root):]
+            for p in ([ref] if ref in located else [p for p in located if ref == p[:len(ref)]]): # A scope depends on everything in it.
+                if p != path:
+                    deps[p] = None
+        graph[path] = tuple(deps)
+    return graph
+
+def topological(graph):
+    'Return the paths of the given graph with each one after all of its dependencies.'
+    order = []
+    state = {}
+    def visit(path):
+        s = state.get(path)
+        if s is None:
+            state[path] = False
+            for dep in graph[path]:
+                visit(dep)
+            state[path] = True
+            order.append(path)
+        elif not s:
+            raise CycleException(path)
+    for path in graph:
+        visit(path)
+    return order
+
+def _dynamic(resolvable):
+    'Whether the resolvable looks up a path that is not known statically, such as the scope itself.'
+    if isinstance(resolvable, Call):
+        args = [a for a in resolvable.args if not a.ignorable]
+        if resolvable.name in getnames and not (args and all(isinstance(a, Text) for a in args)):
+            return True
+        if any(_dynamic(a) for a in args):
+            return True
+    return any(_dynamic(part) for part in getattr(resolvable, 'parts', ()))
+
+def _resolutionscope(scope, path):
+    'The scope that resolving path from the given scope evaluates the found resolvable in.'
+    for _, s in scope._selfandparents():
+        t = s.resolvedscopeornone(path[:-1])
+        if t is not None:
+            return t
+
+def _samefrom(scope, definitions, root, path):
+    'Whether the value at path would be the same if resolved from scope instead of where it is.'
+    s, r = definitions[path]
+    if _dynamic(r):
+        return False
+    for q in _references(r):
+        p = _locate(s, q)
+        if _locate(scope, q) != p:
+            return False
+        if 1 == len(q):
+            if p is not None and p[:len(root)] == root and p[len(root):] in definitions and not _samefrom(scope, definitions, root, p[len(root):]):
+                return False
+        elif _resolutionscope(scope, q) is not _resolutionscope(s, q):
+            return False
+    return True
+
+def evaluate(scope, graph = None):
+    """Resolve every value under the given scope in topological order, so that each one is computed once, and return them by path.
+    A value is reused where it is referenced unless static analysis finds it could differ there, so functions are assumed to use their scope only to resolve their arguments."""
+    if graph is None:
+        graph = dependencies(scope)
+    root = scope.labelpath()
+    definitions = _definitions(scope)
+    values = collections.OrderedDict()
+    untainted = set()
+    for path in topological(graph):
+        s, r = definitions[path]
+        for q in _references(r):
+            p = _locate(s, q)
+            if p is None or p[:len(root)] != root or p[len(root):] not in untainted:
+                continue
+            p = p[len(root):]
+            if _resolutionscope(s, q) is definitions[p][0] or 1 == len(q) and _samefrom(s, definitions, root, p):
+                if s.memo is None:
+                    s.memo = {}
+                s.memo[q, ()] = generation.value, values[p] # As if resolved from s.
+        taint = resolvestate.taint
+        values[path] = scope.resolved(*path)
+        if taint == resolvestate.taint:
+            untainted.add(path)
+    return values
+
+def dependents(graph):
+    'Return the number of direct dependents of each path, most first.'
+    counts = collections.OrderedDict((path, 0) for path in graph)
+    for deps in graph.values():
+        for dep in deps:
+            counts[dep] += 1
+    return sorted(counts.items(), key = lambda t: -t[1])
+
+def chains(graph):
+    'Return the longest reference chain starting at each path, longest first.'
+    longest = {}
+    for path in topological(graph):
+        longest[path] = (path,) + max([longest[dep] for dep in graph[path]] or [()], key = len)
+    return sorted((longest[path] for path in graph), key = lambda c: -len(c))
+
+def _str(path):
+    return ' '.join(map(str, path))
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('-n', type = int, default = 10, help = 'number of paths and chains to report')
+    parser.add_argument('-e', action = 'store_true', help = 'also evaluate everything in topological order and print the seconds it took to stderr')
+    args = parser.parse_args()
+    cc = ConfigCtrl()
+    with cc.repl() as repl:
+        for line in sys.stdin:
+            repl(line)
+    scope = cc.scope()
+    graph = dependencies(scope)
+    sys.stdout.write('Most depended on:\n')
+    for path, count in dependents(graph)[:args.n]:
+        if count:
+            sys.stdout.write("%s\t%s\n" % (count, _str(path)))
+    sys.stdout.write('Deepest chains:\n')
+    for chain in chains(graph)[:args.n]:
+        if 1 < len(chain):
+            sys.stdout.write("%s\t%s\n" % (len(chain), ' -> '.join(map(_str, chain))))
+    if args.e:
+        start = time.time()
+        evaluate(scope, graph)
+        sys.stderr.write("%.3f\n" % (time.time() - start))
+
+if '__main__' == __name__:
+    main()
@@ -106,4 +106,6 @@ class Cat:
     name = '<'
     def __call__(self, prefix, suffix, scope):
         scope = scope.getorcreatesubscope(prefix.topath(scope))
-        scope.resolved('stdout').flush(suffix.tophrase().resolve(scope).openable(scope).processtemplate(scope))
+        stdout = scope.resolved('stdout')
+        suffix.tophrase().resolve(scope).openable(scope).writetemplate(scope, stdout.streamvalue)
+        stdout.streamvalue.flush()
@@ -0,0 +1,223 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .grammar import AnyScalar
+from .model import Blank, Boundary, Call, Concat, Entry, nullmonitor, Text
+import re
+
+class BracketPair:
+
+    def __init__(self, o, c):
+        self.o = o
+        self.c = c
+        self.literalprefixes = "$lit%s" % o, "$'%s" % o
+        self.passprefixes = "$pass%s" % o, "$.%s" % o
+        self.text = re.compile(r"[^$\s%s]+" % re.escape(o + c))
+        self.literaltext = re.compile("[^%s]*" % re.escape(o + c))
+        self.calltext = re.compile("[^$%s]*" % re.escape(o + c))
+
+class Scanner:
+    'Recursive descent equivalent of the pyparsing commandparser, see GFactory for the grammar.'
+
+    bracketpairs = [BracketPair(o, c) for o, c in ['()', '[]']]
+    identifier = re.compile(r'[^\s$(\[]*')
+    anyblank = re.compile(r'\s+')
+    blank = re.compile(r'[^\S\r\n]+')
+    text = re.compile(r'[^$\s]+')
+    boundary = re.compile('[\r\n]+')
+    trailing = re.compile('[ \n\t\r]*') # Whitespace pyparsing skips before StringEnd.
+
+    def __init__(self, s):
+        self.s = s
+
+    def entry(self):
+        s = self.s
+        resolvables = []
+        pos = 0
+        while True:
+            m = self.blank.match(s, pos)
+            r = self._arg(pos if m is None else m.end())
+            if r is None:
+                break
+            if m is not None:
+                resolvables.append(Blank.intern(m.group()))
+            obj, pos = r
+            resolvables.append(obj)
+        if m is not None:
+            resolvables.append(Blank.intern(m.group()))
+            pos = m.end()
+        m = self.boundary.match(s, pos)
+        if m is not None:
+            resolvables.append(Boundary.intern(m.group()))
+            pos = m.end()
+        pos = self.trailing.match(s, pos).end()
+        if pos != len(s):
+            from pyparsing import ParseException
+            raise ParseException(s, pos, 'Expected end of text')
+        return Entry(resolvables)
+
+    def _arg(self, pos):
+        s = self.s
+        parts = []
+        while True:
+            m = self.text.match(s, pos)
+            r = self._callchain(pos if m is None else m.end())
+            if r is None:
+                break
+            if m is not None:
+                parts.append(Text.intern(m.group()))
+            obj, pos = r
+            parts.append(obj)
+        if parts:
+            if m is not None:
+                parts.append(Text.intern(m.group()))
+                pos = m.end()
+            return Concat.unlesssingleton(parts), pos
+        if m is not None:
+            return AnyScalar.of(m.group()), m.end()
+
+    def _callchain(self, pos):
+        s = self.s
+        if not s.startswith('$', pos):
+            return
+        m = self.identifier.match(s, pos + 1)
+        for b in self.bracketpairs:
+            for prefix in b.literalprefixes:
+                if s.startswith(prefix, pos):
+                    start = pos + len(prefix)
+                    end = self._literalbracketed(b, start)
+                    if end is not None:
+                        return Text.intern(s[start:end]), end + len(b.c)
+            for prefix in b.passprefixes:
+                if s.startswith(prefix, pos):
+                    parts, end = self._bracketed(b, Text.intern, Text.intern, pos + len(prefix))
+                    if s.startswith(b.c, end):
+                        return Concat(parts, nullmonitor), end + len(b.c)
+            if s.startswith(b.o, m.end()):
+                args, end = self._bracketed(b, Blank.intern, AnyScalar.of, m.end() + len(b.o))
+                if s.startswith(b.c, end):
+                    return Call(m.group(), args, b.o + b.c), end + len(b.c)
+        r = self._callchain(m.end())
+        if r is not None:
+            obj, end = r
+            return Call(m.group(), [obj], ['', '']), end
+
+    def _literalbracketed(self, b, pos):
+        s = self.s
+        depth = 0
+        while True:
+            pos = b.literaltext.match(s, pos).end()
+            if s.startswith(b.o, pos):
+                depth += 1
+            elif not s.startswith(b.c, pos):
+                return
+            elif depth:
+                depth -= 1
+            else:
+                return pos
+            pos += 1
+
+    def _bracketed(self, b, blankfactory, scalarfactory, pos):
+        s = self.s
+        resolvables = []
+        while True:
+            m = self.anyblank.match(s, pos)
+            r = self._bracketedarg(b, blankfactory, scalarfactory, pos if m is None else m.end())
+            if r is None:
+                break
+            if m is not None:
+                resolvables.append(blankfactory(m.group()))
+            obj, pos = r
+            resolvables.append(obj)
+        if m is not None:
+            resolvables.append(blankfactory(m.group()))
+            pos = m.end()
+        return resolvables, pos
+
+    def _bracketedarg(self, b, blankfactory, scalarfactory, pos):
+        s = self.s
+        parts = []
+        while True:
+            m = b.text.match(s, pos)
+            r = self._chainorbrackets(b, blankfactory, scalarfactory, pos if m is None else m.end())
+            if r is None:
+                break
+            if m is not None:
+                parts.append(Text.intern(m.group()))
+            objs, pos = r
+            parts.extend(objs)
+        if parts:
+            if m is not None:
+                parts.append(Text.intern(m.group()))
+                pos = m.end()
+            return Concat.unlesssingleton(parts), pos
+        if m is not None:
+            return scalarfactory(m.group()), m.end()
+
+    def _chainorbrackets(self, b, blankfactory, scalarfactory, pos):
+        r = self._callchain(pos)
+        if r is not None:
+            obj, end = r
+            return [obj], end
+        s = self.s
+        if s.startswith(b.o, pos):
+            resolvables, end = self._bracketed(b, blankfactory, scalarfactory, pos + len(b.o))
+            if s.startswith(b.c, end):
+                return [Text.intern(b.o)] + resolvables + [Text.intern(b.c)], end + len(b.c)
+
+def fastcommandparser(text):
+    return Scanner(text).entry()
+
+class OpenBrackets:
+    'Incrementally track the call brackets left open by a partial entry, as parsing it before they are closed must fail.'
+
+    bracketpairs = {b.o: b for b in Scanner.bracketpairs}
+    literalidentifiers = 'lit', "'"
+    toplevel = re.compile('[^$]*')
+
+    def __init__(self):
+        self.stack = []
+        self.known = True
+
+    def feed(self, text):
+        'Return True if the entry fed so far is certainly incomplete.'
+        if self.known:
+            pos = 0
+            while True:
+                pos = (self.stack[-1].calltext if self.stack else self.toplevel).match(text, pos).end()
+                if pos == len(text):
+                    break
+                char = text[pos]
+                if '$' == char:
+                    m = Scanner.identifier.match(text, pos + 1)
+                    pos = m.end()
+                    if pos == len(text):
+                        self.known = False
+                        break
+                    char = text[pos]
+                    if '$' == char:
+                        continue
+                    if char not in self.bracketpairs or m.group() in self.literalidentifiers:
+                        self.known = False # Literal fallback and failed calls aren't worth modelling.
+                        break
+                    self.stack.append(self.bracketpairs[char])
+                elif self.stack[-1].o == char:
+                    self.stack.append(self.stack[-1])
+                else:
+                    self.stack.pop()
+                pos += 1
+        return self.known and bool(self.stack)
@@ -17,9 +17,9 @@
 
 from __future__ import division
 from .model import Boolean, Number, Text, wrap
-from .util import allfunctions, dotpy, NoSuchPathException, realname
+from .util import allfunctions, dotpy, NoSuchPathException, pure, realname, volatile
 from importlib import import_module
-import itertools, json, re, shlex
+import itertools, re
 
 xmlentities = dict([c, "&%s;" % w] for c, w in [['"', 'quot'], ["'", 'apos']])
 tomlbasicbadchars = re.compile('[%s]+' % re.escape(r'\"' + ''.join(chr(x) for x in itertools.chain(range(0x08 + 1), range(0x0A, 0x1F + 1), [0x7F]))))
@@ -38,47 +38,68 @@ class OpaqueKey(object):
 
 class Functions:
 
-    from .keyring import gpg, keyring
+    @volatile
+    def keyring(scope, serviceres, usernameres):
+        from .keyring import keyring
+        return keyring(scope, serviceres, usernameres)
 
+    @volatile
+    def gpg(scope, resolvable):
+        from .keyring import gpg
+        return gpg(scope, resolvable)
+
+    @pure
     def screenstr(scope, resolvable):
         text = resolvable.resolve(scope).cat()
         return Text('"%s"' % text.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
 
+    @pure
     def scstr(scope, resolvable):
         'SuperCollider string literal.'
         text = resolvable.resolve(scope).cat()
         return Text('"%s"' % text.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
 
+    @pure
     def hclstr(scope, resolvable):
         text = resolvable.resolve(scope).cat()
         return Text('"%s"' % text.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
 
+    @pure
     def groovystr(scope, resolvable):
         text = resolvable.resolve(scope).cat()
         return Text("'%s'" % text.replace('\\', '\\\\').replace('\n', '\\n').replace("'", "\\'"))
 
+    @pure
     def pystr(scope, resolvable):
         return Text(repr(resolvable.resolve(scope).scalar))
 
+    @pure
     def shstr(scope, resolvable):
+        import shlex
         return Text(shlex.quote(resolvable.resolve(scope).cat()))
 
+    @pure
     def jsonquote(scope, resolvable):
         'Also suitable for YAML.'
+        import json
         return Text(json.dumps(resolvable.resolve(scope).scalar))
 
+    @pure
     def xmlattr(scope, resolvable):
         from xml.sax.saxutils import quoteattr
         return Text(quoteattr(resolvable.resolve(scope).cat())) # TODO: Support booleans.
 
+    @pure
     def xmltext(scope, resolvable):
         'Suggest assigning this to & with xmlattr assigned to " as is convention.'
         from xml.sax.saxutils import escape
         return Text(escape(resolvable.resolve(scope).cat(), xmlentities))
 
+    @pure
     def tomlquote(scope, resolvable):
         return Text(_tomlquote(resolvable.resolve(scope).cat()))
 
+    @pure
     def urlquote(scope, resolvable):
         from urllib.parse import quote
         return Text(quote(resolvable.resolve(scope).cat(), safe = ''))
@@ -193,16 +214,20 @@ class Functions:
     def hereslash(scope, *resolvables):
         return scope.resolved('here').slash((r.resolve(scope).cat() for r in resolvables), False)
 
+    @volatile
     def readfile(scope, resolvable):
         with resolvable.resolve(scope).openable(scope).open(False) as f:
             return Text(f.read())
 
+    @volatile
     def processtemplate(scope, resolvable):
         return Text(resolvable.resolve(scope).openable(scope).processtemplate(scope))
 
+    @pure
     def lower(scope, resolvable):
         return Text(resolvable.resolve(scope).cat().lower())
 
+    @volatile
     def pyref(scope, moduleresolvable, qualnameresolvable):
         def moduleobj():
             moduleref = moduleresolvable.resolve(scope).cat()
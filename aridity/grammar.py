@@ -15,11 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
-from .model import Blank, Boolean, Boundary, Call, Concat, Entry, nullmonitor, Number, Text
+from .model import Blank, Boolean, Boundary, Call, Concat, Entry, nullmonitor, Number, templatemonitor, Text
+from .util import boundedmemo
 from decimal import Decimal
 from functools import partial, reduce
-from pyparsing import Forward, Literal, MatchFirst, NoMatch, OneOrMore, Optional, Regex, Suppress, ZeroOrMore
-import operator, re
+import operator, re, threading
 
 class AnyScalar:
 
@@ -29,21 +29,28 @@ class AnyScalar:
     @classmethod
     def pa(cls, s, l, t):
         text, = t
+        return cls.of(text)
+
+    @classmethod
+    def of(cls, text):
         try:
             return cls.booleans[text]
         except KeyError:
             m = cls.numberpattern.search(text)
-            return Text(text) if m is None or '-0' == text else Number((int if m.group(1) is None else Decimal)(text))
+            return Text.intern(text) if m is None or '-0' == text else Number((int if m.group(1) is None else Decimal)(text))
 
 def _gettext(notchars, pa):
+    from pyparsing import Regex
     return Regex(r"[^$\s%s]+" % re.escape(notchars)).leaveWhitespace().setParseAction(pa)
 
 def _getarg(callchain, scalarpa, boundarychars):
+    from pyparsing import OneOrMore, Optional
     gettext = partial(_gettext, boundarychars)
     opttext = Optional(gettext(Text.pa))
     return (OneOrMore(opttext + callchain) + opttext | gettext(scalarpa)).setParseAction(Concat.smartpa)
 
 def _bracketed(callchain, blankpa, scalarpa, o, c):
+    from pyparsing import Forward, Literal, OneOrMore, Optional, ZeroOrMore
     gettext = partial(_gettext, o + c)
     bracketed = Forward()
     chainorbrackets = callchain | (Literal(o).setParseAction(Text.pa) + bracketed + Literal(c).setParseAction(Text.pa)).leaveWhitespace()
@@ -54,6 +61,7 @@ def _bracketed(callchain, blankpa, scalarpa, o, c):
     return bracketed
 
 def _literalbracketed(o, c):
+    from pyparsing import Forward, Literal, Regex, ZeroOrMore
     bracketed = Forward()
     brackets = (Literal(o) + bracketed + Literal(c)).leaveWhitespace()
     opttext = Regex("[^%s]*" % re.escape(o + c)).leaveWhitespace()
@@ -61,6 +69,7 @@ def _literalbracketed(o, c):
     return bracketed
 
 def _getoptblank(pa, boundarychars):
+    from pyparsing import Optional, Regex
     return Optional(Regex(r"[^\S%s]+" % re.escape(boundarychars)).leaveWhitespace().setParseAction(pa))
 
 class Parser:
@@ -75,6 +84,23 @@ class Parser:
             result, = result
         return result
 
+class LazyParser:
+    'Build the grammar on first parse, as that is a significant part of import time.'
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.parser = None
+
+    def __call__(self, text):
+        parser = self.parser
+        if parser is None:
+            with self.lock:
+                if self.parser is None:
+                    self.parser = self.factory()
+                parser = self.parser
+        return parser(text)
+
 def _principalcallpa(s, l, t):
     return Call(t[0], t[2:-1], t[1] + t[-1])
 
@@ -84,9 +110,9 @@ def _additionalcallpa(s, l, t):
 class GFactory:
 
     bracketpairs = '()', '[]'
-    identifier = Regex(r'[^\s$%s]*' % ''.join(re.escape(o) for o, _ in bracketpairs))
+    identifierpattern = r'[^\s$%s]*' % ''.join(re.escape(o) for o, _ in bracketpairs)
 
-    def __init__(self, scalarpa = AnyScalar.pa, boundarychars = '\r\n', ormorecls = OneOrMore, monitor = nullmonitor):
+    def __init__(self, scalarpa = AnyScalar.pa, boundarychars = '\r\n', ormorecls = None, monitor = nullmonitor):
         self.scalarpa = scalarpa
         self.boundarychars = boundarychars
         self.ormorecls = ormorecls
@@ -99,25 +125,37 @@ class GFactory:
         return Concat(t[1:-1], self.monitor)
 
     def create(self, pa):
+        from pyparsing import Forward, Literal, MatchFirst, NoMatch, OneOrMore, Optional, Regex, Suppress
+        identifier = Regex(self.identifierpattern)
         def itercalls():
             def getbrackets(blankpa, scalarpa):
                 return Literal(o) + _bracketed(callchain, blankpa, scalarpa, o, c) + Literal(c)
             for o, c in self.bracketpairs:
                 yield (Suppress(Regex("[$](?:lit|')")) + Suppress(o) + _literalbracketed(o, c) + Suppress(c)).setParseAction(Text.joinpa)
                 yield (Suppress(Regex('[$](?:pass|[.])')) + getbrackets(Text.pa, Text.pa)).setParseAction(self._bracketspa)
-                yield (Suppress('$') + self.identifier + getbrackets(Blank.pa, AnyScalar.pa)).setParseAction(_principalcallpa)
-                yield (Suppress('$') + self.identifier + callchain).setParseAction(_additionalcallpa)
+                yield (Suppress('$') + identifier + getbrackets(Blank.pa, AnyScalar.pa)).setParseAction(_principalcallpa)
+                yield (Suppress('$') + identifier + callchain).setParseAction(_additionalcallpa)
         optblank = _getoptblank(Blank.pa, self.boundarychars)
         callchain = Forward()
         callchain << MatchFirst(itercalls()).leaveWhitespace()
         return reduce(operator.add, [
-            self.ormorecls(optblank + _getarg(callchain, self.scalarpa, self.boundarychars)),
+            (OneOrMore if self.ormorecls is None else self.ormorecls)(optblank + _getarg(callchain, self.scalarpa, self.boundarychars)),
             optblank,
             Optional(Regex("[%s]+" % re.escape(self.boundarychars)).leaveWhitespace().setParseAction(Boundary.pa) if self.boundarychars else NoMatch()),
         ]).setParseAction(pa)
 
-commandparser = Parser(GFactory(ormorecls = ZeroOrMore).create(Entry.pa))
+def _commandparser():
+    from pyparsing import ZeroOrMore
+    return Parser(GFactory(ormorecls = ZeroOrMore).create(Entry.pa))
 
-def templateparser(monitor):
-    gfactory = GFactory(scalarpa = Text.pa, boundarychars = '', monitor = monitor)
+def _templateparser():
+    from pyparsing import Regex
+    gfactory = GFactory(scalarpa = Text.pa, boundarychars = '', monitor = templatemonitor)
     return Parser(gfactory.create(gfactory.templatepa) | Regex('^$').setParseAction(Text.pa))
+
+commandparser = LazyParser(_commandparser)
+templateparser = LazyParser(_templateparser)
+
+@boundedmemo(256)
+def parsetemplate(text):
+    return templateparser(text)
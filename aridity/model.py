@@ -16,7 +16,7 @@
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
 from __future__ import division
-from .util import dotpy, ispy2
+from .util import boundedmemo, dotpy, ispy2, memoizecalls, resolvestate, resolving, taint
 from contextlib import contextmanager
 from importlib import import_module
 from io import BytesIO, TextIOWrapper
@@ -25,6 +25,8 @@ import importlib_resources, numbers, os
 
 class Struct(object):
 
+    __slots__ = ()
+
     def __eq__(self, that):
         if type(self) != type(that):
             return False
@@ -43,21 +45,33 @@ class Struct(object):
 
 class Resolvable(Struct):
 
+    __slots__ = ()
+
     def resolve(self, scope):
         raise NotImplementedError
 
     def resolvemulti(self, j, scope):
         yield j, self.resolve(scope)
 
+    def resolvedtexts(self, scope):
+        yield self.resolve(scope).cat()
+
 class Resolved(Resolvable):
 
+    __slots__ = ()
+
     def resolve(self, scope, aslist = False):
         return List([self]) if aslist else self
 
-nullmonitor = lambda text: None
+def nullmonitor(text):
+    pass
+
+def templatemonitor(text):
+    raise Exception('Placeholder for the monitor of the template being processed.')
 
 class Concat(Resolvable):
 
+    __slots__ = 'parts', 'monitor'
     ignorable = False
 
     @classmethod
@@ -72,15 +86,25 @@ class Concat(Resolvable):
         self.parts = parts
         self.monitor = monitor
 
+    def __eq__(self, that):
+        return type(self) is type(that) and self.parts == that.parts and self.monitor == that.monitor
+
     def resolve(self, scope, aslist = False):
         if aslist:
             return List([part.resolve(scope) for part in self.parts if not part.ignorable])
-        def g():
-            for part in self.parts:
-                text = part.resolve(scope).cat()
-                yield text
-                self.monitor(text)
-        return Text(''.join(g()))
+        return Text(''.join(self.resolvedtexts(scope)))
+
+    def resolvedtexts(self, scope):
+        'Resolve each part in turn, so that the text can be written out as it is produced.'
+        if templatemonitor == self.monitor:
+            monitor = scope.staticscope().indent.head()
+            taint() # Our effect on the indent depends on where we are in the template.
+        else:
+            monitor = self.monitor
+        for part in self.parts:
+            text = part.resolve(scope).cat()
+            yield text
+            monitor(text)
 
     def unparse(self):
         return ''.join(part.unparse() for part in self.parts)
@@ -90,11 +114,23 @@ class CatNotSupportedException(Exception): pass
 
 class BaseSimpleValue(Resolved):
 
+    __slots__ = ()
+
     @classmethod
     def pa(cls, s, l, t):
         value, = t
+        return cls.intern(value)
+
+    @classmethod
+    def intern(cls, value):
         return cls(value)
 
+    def __eq__(self, that):
+        return type(self) is type(that) and self.scalar == that.scalar
+
+    def __hash__(self):
+        return hash(self.scalar)
+
     def cat(self):
         raise CatNotSupportedException(self)
 
@@ -103,11 +139,15 @@ class BaseSimpleValue(Resolved):
 
 class SimpleValue(BaseSimpleValue):
 
+    __slots__ = 'scalar',
+
     def __init__(self, scalar):
         self.scalar = scalar
 
 class Cat:
 
+    __slots__ = ()
+
     def cat(self):
         return self.scalar
 
@@ -116,31 +156,50 @@ class Cat:
 
 class Blank(Cat, SimpleValue):
 
+    __slots__ = ()
     ignorable = True
     boundary = False
 
+    @classmethod
+    @boundedmemo(256)
+    def intern(cls, value):
+        return cls(value)
+
 class Boundary(SimpleValue):
 
+    __slots__ = ()
     ignorable = True
     boundary = True
 
+    @classmethod
+    @boundedmemo(256)
+    def intern(cls, value):
+        return cls(value)
+
 class BaseScalar(BaseSimpleValue):
 
+    __slots__ = ()
     ignorable = False
 
-    def __hash__(self):
-        return hash(self.scalar)
-
 class Scalar(BaseScalar):
 
+    __slots__ = 'scalar',
+
     def __init__(self, scalar):
         self.scalar = scalar
 
 class Text(Cat, BaseScalar):
 
+    __slots__ = 'textvalue',
+
     @classmethod
     def joinpa(cls, s, l, t):
-        return cls(''.join(t))
+        return cls.intern(''.join(t))
+
+    @classmethod
+    @boundedmemo(4096) # Parsed config repeats names and short values a lot.
+    def intern(cls, value):
+        return cls(value)
 
     @classmethod
     def _of(cls, textvalue):
@@ -153,6 +212,12 @@ class Text(Cat, BaseScalar):
     def __init__(self, textvalue):
         self.textvalue = textvalue
 
+    def __eq__(self, that):
+        return type(self) is type(that) and self.textvalue == that.textvalue
+
+    def __hash__(self):
+        return hash(self.textvalue)
+
     def totext(self):
         return self
 
@@ -191,6 +256,10 @@ class Openable:
         with self.pushopen(scope) as f:
             return Stream(f).processtemplate(scope)
 
+    def writetemplate(self, scope, g):
+        with self.pushopen(scope) as f:
+            Stream(f).writetemplate(scope, g)
+
 class Locator(Resolved, Openable):
 
     @classmethod
@@ -207,6 +276,11 @@ class Locator(Resolved, Openable):
     def open(self, write):
         return open(self.pathvalue, 'w' if write else 'r')
 
+    def source(self, scope, prefix):
+        if resolvestate.sources is not None:
+            resolvestate.sources.add(os.path.abspath(self.pathvalue))
+        super(Locator, self).source(scope, prefix)
+
     def slash(self, words, rstrip):
         return self._of(os.path.join(os.path.dirname(self.pathvalue) if rstrip else self.pathvalue, *words))
 
@@ -251,6 +325,8 @@ class Resource(Resolved, Openable):
 
 class Binary(BaseScalar):
 
+    __slots__ = 'binaryvalue',
+
     @property
     def scalar(self):
         return self.binaryvalue
@@ -264,6 +340,8 @@ class Binary(BaseScalar):
 
 class Number(BaseScalar):
 
+    __slots__ = 'numbervalue',
+
     @property
     def scalar(self):
         return self.numbervalue
@@ -282,6 +360,8 @@ class Number(BaseScalar):
 
 class Boolean(BaseScalar):
 
+    __slots__ = 'booleanvalue',
+
     @property
     def scalar(self):
         return self.booleanvalue
@@ -297,6 +377,7 @@ def star(scope, resolvable):
 
 class Call(Resolvable):
 
+    __slots__ = 'name', 'args', 'brackets'
     ignorable = False
 
     def __init__(self, name, args, brackets):
@@ -304,8 +385,14 @@ class Call(Resolvable):
         self.args = args
         self.brackets = brackets
 
+    def __eq__(self, that):
+        return type(self) is type(that) and self.name == that.name and self.args == that.args and self.brackets == that.brackets
+
     def _functionvalue(self, scope):
-        return scope.resolved(self.name).functionvalue
+        f = scope.resolved(self.name).functionvalue
+        if getattr(f, 'volatile', False):
+            taint()
+        return f
 
     def _resolvables(self):
         for a in self.args:
@@ -313,7 +400,23 @@ class Call(Resolvable):
                 yield a
 
     def resolve(self, scope, aslist = False):
-        result = self._functionvalue(scope)(scope, *self._resolvables())
+        memo = resolvestate.callmemo
+        if memo is None:
+            return self._resolve(scope, aslist)
+        key = id(scope), self.unparse(), aslist
+        try:
+            return memo[key][1]
+        except KeyError:
+            pass
+        taintbefore = resolvestate.taint
+        result = self._resolve(scope, aslist)
+        if taintbefore == resolvestate.taint:
+            memo[key] = scope, result # Keep scope alive so that its id isn't reused.
+        return result
+
+    def _resolve(self, scope, aslist):
+        f = self._functionvalue(scope)
+        result = _purecall(f, scope, self._resolvables()) if getattr(f, 'pure', False) else f(scope, *self._resolvables())
         return List([result]) if aslist else result
 
     def resolvemulti(self, j, scope):
@@ -331,6 +434,16 @@ class Call(Resolvable):
     def cat(self):
         return self.unparse()
 
+def _purecall(f, scope, resolvables):
+    args = tuple(r.resolve(scope) for r in resolvables)
+    if all(Text is type(a) for a in args): # Equal numbers may still unparse differently.
+        return _cachedpurecall(f, args)
+    return f(None, *args) # Whether or not the result is cached.
+
+@boundedmemo(4096)
+def _cachedpurecall(f, args):
+    return f(None, *args)
+
 def List(objs):
     from .scope import Scope
     s = Scope(islist = True)
@@ -373,18 +486,34 @@ class Stream(Resolved):
         self.streamvalue.flush()
 
     def source(self, scope, prefix):
+        from .parsecache import ParseCache
         from .repl import Repl
         with Repl(scope, rootprefix = prefix) as repl:
-            for line in self.streamvalue:
-                repl(line)
+            cache = ParseCache.ofscope(scope)
+            if cache is None:
+                for line in self.streamvalue:
+                    repl(line)
+            else:
+                cache.source(self.streamvalue, repl)
 
     def processtemplate(self, scope):
-        from .grammar import templateparser
-        with scope.staticscope().indent.push() as monitor:
-            return templateparser(monitor)(self.streamvalue.read()).resolve(scope).cat()
+        chunks = []
+        self._rendertemplate(scope, chunks.append)
+        return ''.join(chunks)
+
+    def writetemplate(self, scope, f):
+        self._rendertemplate(scope, f.write)
+
+    def _rendertemplate(self, scope, write):
+        from .grammar import parsetemplate
+        template = parsetemplate(self.streamvalue.read())
+        with scope.staticscope().indent.push(), memoizecalls():
+            for text in resolving((scope, None), template.resolvedtexts(scope)):
+                write(text)
 
 class Entry(Struct):
 
+    __slots__ = 'resolvables',
     wildcard = Text('*')
 
     @classmethod
@@ -394,6 +523,9 @@ class Entry(Struct):
     def __init__(self, resolvables):
         self.resolvables = resolvables
 
+    def __eq__(self, that):
+        return type(self) is type(that) and self.resolvables == that.resolvables
+
     def size(self):
         return sum(1 for r in self.resolvables if not r.ignorable)
 
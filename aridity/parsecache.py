@@ -0,0 +1,96 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from tempfile import NamedTemporaryFile
+import errno, hashlib, logging, os, pickle
+
+log = logging.getLogger(__name__)
+
+def _lines(text): # Like iterating a file, but for str on Python 2 as well.
+    lines = text.split('\n')
+    for line in lines[:-1]:
+        yield line + '\n'
+    if lines[-1]:
+        yield lines[-1]
+
+class ParseCache:
+    'Store the entries parsed from each distinct config text, so that a warm start need not run the parser.'
+
+    version = 2 # Bump when the grammar or model classes change.
+
+    @classmethod
+    def ofscope(cls, scope):
+        dirpath = scope.resolved('parsecache').scalar
+        if dirpath is not None:
+            return cls(dirpath)
+
+    def __init__(self, dirpath):
+        self.dirpath = dirpath
+
+    def _path(self, text):
+        h = hashlib.sha256(("%s\n" % self.version).encode('ascii'))
+        h.update(text if isinstance(text, bytes) else text.encode('utf-8'))
+        return os.path.join(self.dirpath, "%s.pickle" % h.hexdigest())
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError) as e:
+            if errno.ENOENT != e.errno:
+                log.warning("Failed to read parse cache: %s", e)
+        except Exception as e:
+            log.warning("Ignoring corrupt parse cache %s: %s", path, e)
+
+    def _save(self, path, suffixes):
+        try:
+            self._write(path, suffixes)
+        except (IOError, OSError) as e:
+            log.warning("Failed to write parse cache: %s", e)
+
+    def _write(self, path, suffixes):
+        try:
+            os.makedirs(self.dirpath)
+        except OSError as e:
+            if errno.EEXIST != e.errno:
+                raise
+        with NamedTemporaryFile('wb', dir = self.dirpath, delete = False) as f:
+            try:
+                pickle.dump(suffixes, f, pickle.HIGHEST_PROTOCOL)
+                f.close()
+                os.rename(f.name, path)
+            except:
+                f.close()
+                os.remove(f.name)
+                raise
+
+    def source(self, f, repl):
+        text = f.read()
+        path = self._path(text)
+        suffixes = self._load(path)
+        if suffixes is None:
+            suffixes = []
+            for line in _lines(text):
+                suffix = repl.parse(line)
+                if suffix is not None:
+                    suffixes.append(suffix)
+                    repl.accept(suffix)
+            if not repl.stack:
+                self._save(path, suffixes)
+        else:
+            for suffix in suffixes:
+                repl.accept(suffix)
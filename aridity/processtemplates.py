@@ -0,0 +1,41 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+'Process each given template to its destination using config from stdin, printing timings to stderr.'
+from .config import ConfigCtrl
+from argparse import ArgumentParser
+import sys
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('-j', type = int, default = 0, help = 'number of workers, default is to process templates in turn')
+    parser.add_argument('--processes', action = 'store_true', help = 'use forked processes instead of threads')
+    parser.add_argument('pairs', nargs = '+', metavar = 'TEMPLATE=DEST')
+    args = parser.parse_args()
+    pairs = [pair.split('=', 1) for pair in args.pairs]
+    for pair, arg in zip(pairs, args.pairs):
+        if 2 != len(pair):
+            parser.error("Expected TEMPLATE=DEST: %s" % arg)
+    cc = ConfigCtrl()
+    with cc.repl() as repl:
+        for line in sys.stdin:
+            repl(line)
+    for (templatepath, topath), seconds in zip(pairs, cc.processtemplates(pairs, args.j, args.processes)):
+        sys.stderr.write("%.3f %s %s\n" % (seconds, templatepath, topath))
+
+if '__main__' == __name__:
+    main()
@@ -15,10 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
+from .fastparser import fastcommandparser, OpenBrackets
 from .grammar import commandparser
 from .model import Entry, Text
 from .scope import Scope
-import pyparsing, re, traceback
+import re, traceback
 
 class DanglingStackException(Exception): pass
 
@@ -48,12 +49,14 @@ class Repl:
 
     def __init__(self, scope = None, interactive = False, rootprefix = Entry([])):
         self.stack = []
+        self.openbrackets = OpenBrackets()
         self.indent = ''
         self.command = Entry([Text(':')])
         self.commandsize = self.command.size()
         self.partials = {'': rootprefix}
         self.scope = Scope() if scope is None else scope
         self.interactive = interactive
+        self.parser = fastcommandparser if self.scope.resolved('fastparser').scalar else commandparser
 
     def __enter__(self):
         return self
@@ -62,12 +65,26 @@ class Repl:
         self(template % tuple(self._quote(a) for a in args))
 
     def __call__(self, line):
-        try:
-            suffix = commandparser(''.join(self.stack + [line]))
-            del self.stack[:]
-        except pyparsing.ParseException:
-            self.stack.append(line)
+        suffix = self.parse(line)
+        if suffix is not None:
+            self.accept(suffix)
+
+    def parse(self, line):
+        self.stack.append(line)
+        if self.openbrackets.feed(line):
             return
+        try:
+            suffix = self.parser(''.join(self.stack))
+        except Exception as e:
+            from pyparsing import ParseException # Already loaded by whichever parser raised.
+            if isinstance(e, ParseException):
+                return
+            raise
+        del self.stack[:]
+        self.openbrackets = OpenBrackets()
+        return suffix
+
+    def accept(self, suffix):
         indent = suffix.indent()
         common = min(len(self.indent), len(indent))
         if indent[:common] != self.indent[:common]:
@@ -20,16 +20,39 @@ from .directives import Precedence
 from .functions import getfunctions, OpaqueKey
 from .model import CatNotSupportedException, Directive, Function, Resolvable, Scalar, star, Stream, Text
 from .stacks import IndentStack, SimpleStack, ThreadLocalResolvable
-from .util import CycleException, NoSuchPathException, OrderedDict, solo, TreeNoSuchPathException, UnparseNoSuchPathException, UnsupportedEntryException
+from .util import CycleException, ispy2, NoSuchPathException, OrderedDict, recordreads, resolvestate, resolving, solo, TreeNoSuchPathException, UnparseNoSuchPathException, UnsupportedEntryException
 import collections, os, sys, threading, unicodedata
 
 class NotAPathException(Exception): pass
 
 class NotAResolvableException(Exception): pass
 
+class Generation:
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def bump(self):
+        with self.lock:
+            self.value += 1
+
+generation = Generation() # Of the config, not bumped by resolution as that may only write to scratch scopes.
+parentsgeneration = Generation()
+lazylock = threading.Lock() # For creating per-scope objects that most scopes never need.
+dicttype = collections.OrderedDict if ispy2 else dict
+
 class Resolvables:
 
+    __slots__ = 'd', 'scope', 'protocache', 'virtuals', 'attachment', 'shared', 'ownedkeys'
+
     def _proto(self):
+        g = generation.value
+        if self.protocache is None or self.protocache[0] != g:
+            self.protocache = g, self._findproto()
+        return self.protocache[1]
+
+    def _findproto(self):
         def allparents():
             scopes = [self.scope]
             while scopes:
@@ -60,11 +83,34 @@ class Resolvables:
         return {}
 
     def __init__(self, scope):
-        self.d = collections.OrderedDict()
+        self.d = dicttype()
         self.scope = scope
+        self.protocache = None
+        self.virtuals = None
+        self.attachment = None
+        self.shared = False # Whether d is also used by a duplicate, so must be copied before writing.
+        self.ownedkeys = None # Unless None, the only keys whose child scopes are not also in a duplicate.
+
+    def share(self, that):
+        that.d = self.d
+        self.shared = that.shared = True
+        self.ownedkeys = set()
+        that.ownedkeys = set()
+
+    def owns(self, key):
+        return self.ownedkeys is None or key in self.ownedkeys or key not in self.d
 
     def put(self, key, resolvable):
+        if self.attachment is not None:
+            self._attach()
+        if self.shared:
+            self.d = dicttype(self.d)
+            self.shared = False
+        if self.ownedkeys is not None:
+            self.ownedkeys.add(key)
         self.d[key] = resolvable
+        if not resolvestate.stack:
+            generation.bump()
 
     def getornone(self, key):
         try:
@@ -72,8 +118,28 @@ class Resolvables:
         except KeyError:
             pass
         obj = self._proto().get(key)
-        # FIXME LATER: Reads should be thread-safe, only create child if we're about to put something in it.
-        return self.scope._putchild(key) if hasattr(obj, 'resolvables') else obj
+        return self._virtualchild(key) if hasattr(obj, 'resolvables') else obj
+
+    def _virtualchild(self, key): # Not in the tree until something is put in it, so that reads have no side-effects.
+        virtuals = self.virtuals
+        if virtuals is None:
+            with lazylock:
+                if self.virtuals is None:
+                    self.virtuals = {}
+            virtuals = self.virtuals
+        try:
+            return virtuals[key]
+        except KeyError:
+            child = self.scope._newchild(key)
+            child.resolvables.attachment = self, key
+            return virtuals.setdefault(key, child) # Atomic, so concurrent readers agree on the child.
+
+    def _attach(self):
+        parent, key = self.attachment
+        self.attachment = None
+        parent.put(key, self.scope)
+        if parent.virtuals is not None:
+            parent.virtuals.pop(key, None)
 
     def items(self):
         for k, v in self.d.items():
@@ -81,21 +147,50 @@ class Resolvables:
                 yield k, v
         for k, v in self._proto().items():
             if Star.protokey != k and k not in self.d:
-                yield k, v
+                yield k, self._virtualchild(k) if hasattr(v, 'resolvables') else v
 
 # XXX: Isn't this Resolved rather than Resolvable?
 class AbstractScope(Resolvable): # TODO LATER: Some methods should probably be moved to Scope.
 
+    cyclecheckdepth = 32 # A cycle keeps growing the resolution stack, so it's enough to look for repeats once it's this deep.
     nametypes = {str, type(None), OpaqueKey} # XXX: Is None still used by anything?
     try:
         nametypes.add(unicode)
     except NameError:
         pass
 
+    __slots__ = 'resolvables', '_threadlocals', '_parents', '_ancestry', 'memo', 'lookupsmemo', 'label'
+
     def __init__(self, parents):
         self.resolvables = Resolvables(self)
-        self.threadlocals = threading.local()
-        self.parents = parents
+        self._threadlocals = None
+        self._parents = tuple(parents)
+        self._ancestry = None
+        self.memo = None
+        self.lookupsmemo = None # Of overlays of this scope.
+
+    def __eq__(self, that):
+        return self is that
+
+    @property
+    def threadlocals(self):
+        threadlocals = self._threadlocals
+        if threadlocals is None:
+            with lazylock:
+                if self._threadlocals is None:
+                    self._threadlocals = threading.local()
+            threadlocals = self._threadlocals
+        return threadlocals
+
+    @property
+    def parents(self):
+        return self._parents
+
+    @parents.setter
+    def parents(self, parents):
+        self._parents = tuple(parents)
+        parentsgeneration.bump() # Descendants may have cached this scope's ancestry.
+        generation.bump()
 
     def __setitem__(self, path, resolvable):
         # TODO: Interpret non-tuple path as singleton.
@@ -108,89 +203,147 @@ class AbstractScope(Resolvable): # TODO LATER: Some methods should probably be m
     def getorcreatesubscope(self, path):
         for name in path:
             that = self.resolvables.getornone(name)
-            if that is None:
-                that = self._putchild(name)
-            self = that
+            self = self._putchild(name) if that is None else self._ownchild(name, that)
         return self
 
-    def _putchild(self, key):
+    def _ownchild(self, name, that):
+        if self.resolvables.owns(name) or not hasattr(that, 'resolvables'):
+            return that
+        that = that.duplicate() # Copy on write.
+        that.label = Text(name)
+        self.resolvables.put(name, that)
+        return that
+
+    def _newchild(self, key):
         child = self.createchild()
         # XXX: Deduce label to allow same Scope in multiple trees?
         child.label = Text(key) # TODO: Not necessarily str.
+        return child
+
+    def _putchild(self, key):
+        child = self._newchild(key)
         self.resolvables.put(key, child)
         return child
 
     def duplicate(self):
+        'Return a sibling with the same content, sharing structure with this scope until either is written.'
         s = solo(self.parents).createchild()
-        for k, v in self.resolvables.items():
-            try:
-                d = v.duplicate
-            except AttributeError:
-                pass
-            else:
-                v = d()
-                v.label = Text(k)
-            s.resolvables.put(k, v)
+        self.resolvables.share(s.resolvables)
         return s
 
     def resolved(self, *path, **kwargs):
-        try:
-            resolving = self.threadlocals.resolving
-        except AttributeError:
-            self.threadlocals.resolving = resolving = set()
-        if path in resolving:
+        key = path, tuple(sorted(kwargs.items()))
+        g = generation.value
+        memo = self.memo
+        if memo is not None:
+            try:
+                memog, obj = memo[key]
+            except KeyError:
+                pass
+            else:
+                if memog == g and resolvestate.reads is None:
+                    return obj
+        reads = resolvestate.reads
+        if reads is not None and path:
+            self._recordreads(reads, path)
+        stack = resolvestate.stack
+        frame = self, path
+        if len(stack) >= self.cyclecheckdepth and frame in stack:
             raise CycleException(path)
-        resolving.add(path)
+        stack.append(frame)
+        taint = resolvestate.taint
         try:
-            return self._resolved(path, self._findresolvable(path), kwargs) if path else self
+            obj = self._resolved(path, self._findresolvable(path), kwargs) if path else self
         finally:
-            resolving.remove(path)
+            stack.pop()
+        if taint == resolvestate.taint:
+            if self.memo is None:
+                self.memo = {}
+            self.memo[key] = g, obj
+        return obj
+
+    def labelpath(self):
+        'Path of this scope from the nearest unlabelled ancestor.'
+        path = []
+        s = self
+        while s.parents:
+            try:
+                path.append(s.label.scalar)
+            except AttributeError:
+                break
+            s = s.parents[0]
+        return tuple(reversed(path))
 
-    def resolvedscopeornone(self, path):
+    def resolvedscopeornone(self, path, forwrite = False):
+        'Unless forwrite is false, take ownership of any child shared with a duplicate so that writes to the result are not seen by the duplicate.'
         s = self # Assume we are resolved.
         for name in path:
             r = s.resolvables.getornone(name)
             if r is None:
                 return
+            if forwrite:
+                r = s._ownchild(name, r)
             s = r.resolve(s)
             if not hasattr(s, 'resolvables'):
                 return
         return s
 
     def _selfandparents(self):
+        g = parentsgeneration.value
+        if self._ancestry is not None and self._ancestry[0] == g:
+            return self._ancestry[1]
+        ancestry = []
         scopes = [self]
         depth = 0
         while scopes:
             nextscopes = []
             for s in scopes:
-                yield depth, s
+                ancestry.append((depth, s))
                 nextscopes.extend(s.parents)
             scopes = nextscopes
             depth += 1
+        self._ancestry = g, ancestry
+        return ancestry
 
-    def _scoreresolvables(self, path):
+    def _bestresolvable(self, path): # Score is the depth of each component in reverse, find the first minimum without trying every candidate.
         tail = path[1:]
+        best = None
         for k, s in self._selfandparents():
             r = s.resolvables.getornone(path[0])
             if r is not None:
-                if tail:
-                    obj = r.resolve(s) # XXX: Wise?
+                if not tail:
+                    return (k,), r
+                obj = r.resolve(s) # XXX: Wise?
+                try:
+                    obj_best = obj._bestresolvable
+                except AttributeError:
+                    continue
+                t = obj_best(tail)
+                if t is not None:
+                    score, rr = t
+                    if best is None or score + (k,) < best[0]:
+                        best = score + (k,), rr
+                        if not any(score):
+                            break # Any later candidate is at least as deep.
+        return best
+
+    def _recordreads(self, reads, path): # Every candidate that _bestresolvable may consider, as any of them may shadow the others.
+        for _, s in self._selfandparents():
+            reads.add(s.labelpath() + path)
+            if path[1:]:
+                r = s.resolvables.getornone(path[0])
+                if r is not None:
                     try:
-                        obj_score = obj._scoreresolvables
-                    except AttributeError:
-                        pass
-                    else:
-                        for score, rr in obj_score(tail):
-                            yield score + [k], rr
-                else:
-                    yield [k], r
+                        obj_recordreads = r.resolve(s)._recordreads
+                    except (AttributeError, NoSuchPathException):
+                        continue
+                    obj_recordreads(reads, path[1:])
 
     def _findresolvable(self, path):
-        pairs = list(self._scoreresolvables(path))
-        try:
-            return min(pairs, key = lambda t: t[0])[1]
-        except ValueError:
+        t = self._bestresolvable(path)
+        if t is None:
             raise UnparseNoSuchPathException(path)
+        return t[1]
 
     def _resolved(self, path, resolvable, kwargs): # TODO: Review this algo.
         errors = []
@@ -206,12 +359,14 @@ class AbstractScope(Resolvable): # TODO LATER: Some methods should probably be m
 
     def unravel(self):
         d = OrderedDict([k, o.unravel()] for k, o in self.resolveditems())
-        return list(d) if self.islist or (d and all(OpaqueKey.isopaque(k) for k in d.keys())) else d
+        return list(d) if self.islistof(d.keys()) else d
+
+    def islistof(self, keys):
+        keys = list(keys)
+        return self.islist or bool(keys and all(OpaqueKey.isopaque(k) for k in keys))
 
     def staticscope(self):
-        for _, s in self._selfandparents():
-            pass
-        return s
+        return self._selfandparents()[-1][1]
 
     def execute(self, entry, lenient = False):
         directives = []
@@ -251,7 +406,7 @@ class AbstractScope(Resolvable): # TODO LATER: Some methods should probably be m
 
     def resolveditems(self):
         for k, r in self.resolvables.items():
-            for t in r.resolvemulti(k, self):
+            for t in resolving((self, None), r.resolvemulti(k, self)):
                 yield t
 
     def createchild(self, **kwargs):
@@ -269,6 +424,7 @@ def _categoryornone(c):
 
 class StaticScope(AbstractScope):
 
+    __slots__ = ()
     stacktypes = dict(here = SimpleStack, indent = IndentStack)
 
     def __init__(self):
@@ -279,6 +435,8 @@ class StaticScope(AbstractScope):
             self[name,] = Function(f)
         self['keyring_cron',] = Scalar(False)
         self['keyring_force',] = Scalar(False)
+        self['fastparser',] = Scalar(False)
+        self['parsecache',] = Scalar(None)
         self['~',] = Text(os.path.expanduser('~'))
         self['LF',] = Text('\n')
         self['EOL',] = Text(os.linesep)
@@ -328,6 +486,8 @@ StaticScope = StaticScope()
 
 class Scope(AbstractScope):
 
+    __slots__ = 'islist',
+
     def __init__(self, parents = None, islist = False):
         super(Scope, self).__init__([StaticScope] if parents is None else parents)
         self.islist = islist
@@ -338,8 +498,85 @@ class Scope(AbstractScope):
     def tojava(self):
         return Text(''.join("%s %s\n" % (k, v.resolve(self).unravel()) for k, v in self.resolvables.items())) # TODO: Escaping.
 
+class OverlayScope(Scope):
+    'Child of a base scope with a small delta, reads that the delta cannot affect are served by the base and its memo.'
+
+    __slots__ = 'overlaid',
+
+    def __init__(self, base, delta):
+        super(OverlayScope, self).__init__([base])
+        for path, resolvable in delta: # Nothing can have memoized these new scopes, so bypass put and its generation bump.
+            s = self
+            for name in path[:-1]:
+                child = s.resolvables.d.get(name)
+                if child is None:
+                    child = s.resolvables.d[name] = s._newchild(name)
+                s = child
+            s.resolvables.d[path[-1]] = resolvable
+        self.overlaid = None
+
+    def _deltapaths(self):
+        paths = []
+        def walk(s, path):
+            for k, r in s.resolvables.d.items():
+                if hasattr(r, 'resolvables') and r.resolvables.d:
+                    walk(r, path + (k,))
+                else:
+                    paths.append(path + (k,))
+        walk(self, ())
+        return paths
+
+    def _baselookups(self, base, path):
+        'Return what resolving path in base looked up and whether the result depends on the asking scope, and the result if it had to be resolved to find out.'
+        g = generation.value
+        memo = base.lookupsmemo # So that every overlay of base can use them.
+        if memo is not None:
+            try:
+                memog, t = memo[path]
+            except KeyError:
+                pass
+            else:
+                if memog == g:
+                    return t, None
+        obj = None
+        with recordreads() as reads:
+            try:
+                obj = base.resolved(*path)
+            except NoSuchPathException:
+                pass
+        lookups = set(read[i:] for read in reads for i in range(len(read))) # Any suffix of a read may be the path that was looked up.
+        scoped = hasattr(obj, 'resolvables') and obj is not base._findresolvable(path) # Computed scopes such as $() and $list are of the asking scope.
+        t = lookups, set(l[:n] for l in lookups for n in range(1, len(l) + 1)), scoped
+        if base.lookupsmemo is None:
+            base.lookupsmemo = {}
+        base.lookupsmemo[path] = g, t
+        return t, obj
+
+    def _affects(self, deltapaths, path): # The path itself is among the lookups.
+        (lookups, prefixes, scoped), obj = self._baselookups(self.parents[0], path)
+        return scoped or any(d in prefixes or any(d[:n] in lookups for n in range(1, len(d) + 1)) for d in deltapaths), obj
+
+    def resolved(self, *path, **kwargs):
+        if path and not kwargs:
+            g = generation.value
+            overlaid = self.overlaid
+            if overlaid is None or overlaid[0] != g:
+                overlaid = self.overlaid = g, self._deltapaths(), {}
+            _, deltapaths, affected = overlaid
+            try:
+                a = affected[path]
+                obj = None
+            except KeyError:
+                a, obj = self._affects(deltapaths, path)
+                affected[path] = a
+            if not a:
+                return self.parents[0].resolved(*path) if obj is None else obj # Not again, in case it's volatile.
+        return super(OverlayScope, self).resolved(*path, **kwargs)
+
 class ScalarScope(Scope):
 
+    __slots__ = 'scalarobj',
+
     def __init__(self, parents, scalarobj):
         super(ScalarScope, self).__init__(parents)
         self.scalarobj = scalarobj
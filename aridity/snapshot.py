@@ -0,0 +1,45 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+'Binary snapshot of a resolved scope, loadable as a FrozenConfig without parsing anything.'
+from .config import FrozenConfig
+from .util import OrderedDict
+import pickle
+
+magic = b'aridity-snapshot\n'
+version = 2 # Bump when the node table layout changes.
+
+class SnapshotFormatException(Exception): pass
+
+def dump(scope, f):
+    'Write the given resolved scope to binary stream f, every value must be picklable.'
+    f.write(magic)
+    pickle.dump((version, FrozenConfig.nodetable(scope)), f, pickle.HIGHEST_PROTOCOL)
+
+def load(f):
+    'Read a snapshot written by dump from f, which may be a binary stream or an mmap.'
+    if f.read(len(magic)) != magic:
+        raise SnapshotFormatException('Not a snapshot.')
+    v, nodes = pickle.load(f)
+    if version != v:
+        raise SnapshotFormatException("Unsupported snapshot version: %s" % v)
+    return FrozenConfig.fromnodetable(nodes)
+
+def unravel(frozen):
+    'Like Scope.unravel but for a FrozenConfig.'
+    items = [(k, unravel(v) if isinstance(v, FrozenConfig) else v) for k, v in frozen._frozenitems]
+    return [v for _, v in items] if frozen._frozenislist else OrderedDict(items)
@@ -16,7 +16,7 @@
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
 from .model import Resolvable, Text
-from .util import NoSuchPathException
+from .util import NoSuchPathException, taint
 from contextlib import contextmanager
 import re
 
@@ -27,6 +27,7 @@ class ThreadLocalResolvable(Resolvable):
         self.name = name
 
     def resolve(self, scope):
+        taint()
         return getattr(self.threadlocals, self.name).resolve(scope)
 
 class Stack:
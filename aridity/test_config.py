@@ -16,14 +16,15 @@
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
 from .config import Config, ConfigCtrl
-from .model import Boolean, Function, Number, Resource, Scalar, star, Stream, Text
-from .util import ispy2, NoSuchPathException
+from .model import Boolean, Function, Number, Resource, Scalar, star, Stream, Text, wrap
+from .util import ispy2, NoSuchPathException, solo
+from copy import copy, deepcopy
 from functools import wraps
 from io import BytesIO, StringIO
 from shutil import rmtree
 from tempfile import mkdtemp
 from unittest import TestCase
-import os
+import os, pickle, unittest
 
 def _flip(cls):
     def d(f):
@@ -337,6 +338,255 @@ y
             r.houpla
         self.assertEqual(100, r.yay.houpla)
 
+    def test_protochildonwrite(self):
+        cc = ConfigCtrl()
+        cc.execute('''x * sub y = 100
+x a b = 200''')
+        s = cc.scope().resolved('x', 'a')
+        self.assertEqual(['b'], list(s.resolvables.d))
+        self.assertEqual(100, cc.node.x.a.sub.y)
+        self.assertEqual(['b'], list(s.resolvables.d))
+        cc.node.x.a.sub.z = 300
+        self.assertEqual(['b', 'sub'], list(s.resolvables.d))
+        self.assertEqual(100, cc.node.x.a.sub.y)
+        self.assertEqual(300, cc.node.x.a.sub.z)
+        with self.assertRaises(AttributeError):
+            cc.node.x.b.sub.z
+
+    def test_concurrentreads(self):
+        from threading import Thread
+        cc = ConfigCtrl()
+        cc.execute('''x * sub
+    y = $(a)
+    z = $(y)-$label()''')
+        for i in range(10):
+            cc.execute("x k%s a = %s" % (i, i))
+        expected = {"k%s" % i: [i, "%s-sub" % i, i] for i in range(10)}
+        results = []
+        def read():
+            actual = {}
+            for _ in range(20):
+                for k in sorted(expected):
+                    n = getattr(cc.node.x, k)
+                    actual[k] = [n.sub.y, n.sub.z, n.a]
+            results.append(actual)
+        threads = [Thread(target = read) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([expected] * len(threads), results)
+        for i in range(10):
+            self.assertEqual(['a'], list(cc.scope().resolved('x', "k%s" % i).resolvables.d))
+
+    def test_freeze(self):
+        cc = ConfigCtrl()
+        cc.execute('''TOP = $()
+x * sub
+    y = $(a)
+x k a = 100
+l = $list(woo true 1.5)
+n m = $(TOP)''')
+        f = cc.freeze()
+        self.assertEqual(100, f.x.k.a)
+        self.assertEqual(100, f.x.k.sub.y)
+        self.assertEqual([100], list(f.x.k.sub))
+        self.assertEqual(['woo', True, 1.5], list(f.l))
+        self.assertIs(f, f.TOP)
+        self.assertIs(f.n, f.n.m)
+        with self.assertRaises(AttributeError):
+            f.nosuch
+        with self.assertRaises(AttributeError):
+            f.woo = 'yay'
+        with self.assertRaises(AttributeError):
+            f.x.k.b = 200
+        cc.node.woo = 'yay'
+        with self.assertRaises(AttributeError):
+            f.woo
+        for g in copy(f), deepcopy(f), pickle.loads(pickle.dumps(f, pickle.HIGHEST_PROTOCOL)):
+            self.assertEqual(100, g.x.k.sub.y)
+            self.assertEqual(['woo', True, 1.5], list(g.l))
+            self.assertIs(g.n, g.n.m)
+            with self.assertRaises(AttributeError):
+                g.woo = 'yay'
+        for g in deepcopy(f), pickle.loads(pickle.dumps(f, pickle.HIGHEST_PROTOCOL)):
+            self.assertIs(g, g.TOP)
+
+    def test_freezecomputedscopes(self):
+        cc = ConfigCtrl()
+        cc.execute('\n'.join("k%s = $list(%s %s)" % (i, i, i + 1) for i in range(3000)))
+        f = cc.freeze()
+        for i in range(3000):
+            self.assertEqual([i, i + 1], list(getattr(f, "k%s" % i)))
+
+    def test_processtemplates(self):
+        cc = ConfigCtrl()
+        cc.execute('x = X\ny = $(x)Y')
+        d = mkdtemp()
+        try:
+            templates = []
+            for i in range(4):
+                templates.append(os.path.join(d, "%s.aridt" % i))
+                with open(templates[-1], 'w') as f:
+                    f.write("%s $(y)" % i)
+            for kwargs in {}, dict(workers = 2), dict(workers = 2, processes = True):
+                pairs = [(t, t[:-len('.aridt')]) for t in templates]
+                seconds = cc.processtemplates(pairs, **kwargs)
+                self.assertEqual(len(pairs), len(seconds))
+                for i, (_, topath) in enumerate(pairs):
+                    with open(topath) as f:
+                        self.assertEqual("%s XY" % i, f.read())
+                    os.remove(topath)
+        finally:
+            rmtree(d)
+
+    @unittest.skipIf(ispy2, 'No start methods.')
+    def test_processtemplatesspawndefault(self):
+        import multiprocessing
+        method = multiprocessing.get_start_method(True)
+        multiprocessing.set_start_method('spawn', True)
+        try:
+            cc = ConfigCtrl()
+            cc.execute('x = X')
+            d = mkdtemp()
+            try:
+                template, topath = os.path.join(d, 't.aridt'), os.path.join(d, 't')
+                with open(template, 'w') as f:
+                    f.write('$(x)')
+                cc.processtemplates([(template, topath)], workers = 2, processes = True)
+                with open(topath) as f:
+                    self.assertEqual('X', f.read())
+            finally:
+                rmtree(d)
+        finally:
+            multiprocessing.set_start_method(method, True)
+
+    def test_processtemplatefailure(self):
+        cc = ConfigCtrl()
+        cc.execute('x = X')
+        d = mkdtemp()
+        try:
+            template, topath = os.path.join(d, 't.aridt'), os.path.join(d, 't')
+            with open(template, 'w') as f:
+                f.write('a $(x) b $(nosuch)')
+            with open(topath, 'w') as f:
+                f.write('GOOD\n')
+            os.chmod(topath, 0o640)
+            with self.assertRaises(NoSuchPathException):
+                cc.processtemplate(template, topath)
+            with open(topath) as f:
+                self.assertEqual('GOOD\n', f.read())
+            self.assertEqual(['t', 't.aridt'], sorted(os.listdir(d)))
+            with open(template, 'w') as f:
+                f.write('a $(x) b')
+            cc.processtemplate(template, topath)
+            with open(topath) as f:
+                self.assertEqual('a X b', f.read())
+            self.assertEqual(0o640, os.stat(topath).st_mode & 0o777)
+            link = os.path.join(d, 'link')
+            os.symlink(topath, link)
+            with open(template, 'w') as f:
+                f.write('c $(x) d')
+            cc.processtemplate(template, link)
+            self.assertTrue(os.path.islink(link))
+            with open(topath) as f:
+                self.assertEqual('c X d', f.read())
+        finally:
+            rmtree(d)
+
+    def test_readsdonotbumpgeneration(self):
+        from .scope import generation
+        cc = ConfigCtrl()
+        cc.execute('''a = $list(x y)
+m = $map($(a) v $(v)z)
+s = $join($(a) ,)''')
+        other = ConfigCtrl()
+        g = generation.value
+        self.assertEqual({'a': ['x', 'y'], 'm': ['xz', 'yz'], 's': 'x,y'}, cc.scope().unravel())
+        self.assertEqual(3, len(list(cc.node)))
+        cc.freeze()
+        buffer = StringIO()
+        cc.processtemplate(StringIO(u'$(s) $join($map($(a) v $(v)w) +)'), buffer)
+        self.assertEqual('x,y xw+yw', buffer.getvalue())
+        self.assertEqual(g, generation.value)
+        for k, _ in cc.scope().resolveditems():
+            other.put(k, text = 'w')
+        self.assertEqual(g + 3, generation.value)
+
+    def test_writeduplicate(self):
+        cc = ConfigCtrl()
+        cc.execute('app db host = h')
+        cc.basescope['app2',] = cc.basescope.resolved('app').duplicate()
+        cc.node.app2.db.host = 'CHANGED'
+        self.assertEqual('h', cc.node.app.db.host)
+        self.assertEqual('CHANGED', cc.node.app2.db.host)
+        ctrl = ConfigCtrl(cc.basescope, ['app', 'db'])
+        ctrl.scope(True)['port',] = Number(80)
+        ctrl.load(StringIO(u'user = u'))
+        self.assertEqual({'host': 'h', 'port': 80, 'user': 'u'}, cc.scope().resolved('app', 'db').unravel())
+        self.assertEqual({'host': 'CHANGED'}, cc.scope().resolved('app2', 'db').unravel())
+
+    def test_overlayctrl(self):
+        cc = ConfigCtrl()
+        cc.execute('host = h\nport = 80\nurl = http://$(host)/x\nother = o\ndb\n    name = d\n    dsn = $(host):$(port)/$(name)')
+        paths = [['host'], ['port'], ['url'], ['other'], ['db', 'name'], ['db', 'dsn']]
+        for delta in {'host': 'H'}, {('db', 'name'): 'n'}, {'port': 81, 'other': 'O'}, {'lower': lambda scope, r: None}:
+            overlay = cc.overlayctrl(delta)
+            child = cc.childctrl()
+            for path, value in delta.items():
+                child.put(*path if tuple == type(path) else [path], resolvable = wrap(value))
+            for path in paths:
+                self.assertEqual(child.scope().resolved(*path), overlay.scope().resolved(*path))
+        self.assertIs(cc.scope().resolved('db', 'dsn'), cc.overlayctrl({'other': 'O'}).scope().resolved('db', 'dsn'))
+        overlay = cc.overlayctrl({'port': 81})
+        self.assertEqual('http://h/x', overlay.node.url)
+        overlay.node.host = 'H'
+        self.assertEqual('http://H/x', overlay.node.url)
+        self.assertEqual(81, overlay.node.port)
+        self.assertEqual('http://h/x', cc.node.url)
+
+    def test_overlayctrlscoped(self):
+        calls = []
+        def f(scope):
+            calls.append(None)
+            return Text('F')
+        f.volatile = True
+        cc = ConfigCtrl()
+        cc.put('f', function = f)
+        cc.execute('TOP = $()\nv = $f()\nl = $list(a b)\ndb host = h\nx = X')
+        overlay = cc.overlayctrl({'x': 'Y'})
+        self.assertEqual('F', overlay.node.v)
+        self.assertEqual(1, len(calls))
+        self.assertIs(overlay.scope(), overlay.scope().resolved('TOP'))
+        self.assertIs(overlay.scope(), solo(overlay.scope().resolved('l').parents))
+        self.assertIs(cc.scope().resolved('db'), overlay.scope().resolved('db'))
+
+    def test_templatebatch(self):
+        cc = ConfigCtrl()
+        cc.execute('x = X\ny = $(x)Y\nw = W\nns\n    z = Z')
+        d = mkdtemp()
+        try:
+            pairs = []
+            for i, text in enumerate(['$(y)', '$(ns z)', '$(ns w)', '$(w)']):
+                pairs.append((os.path.join(d, "%s.aridt" % i), os.path.join(d, str(i))))
+                with open(pairs[-1][0], 'w') as f:
+                    f.write(text)
+            batch = cc.templatebatch(pairs)
+            self.assertEqual(pairs, batch.affected([]))
+            batch.processall()
+            self.assertEqual([], batch.affected([]))
+            cc.w.x = 'X2'
+            self.assertEqual(pairs[:1], batch.reprocess([('x',)]))
+            with open(pairs[0][1]) as f:
+                self.assertEqual('X2Y', f.read())
+            self.assertEqual(pairs[1:2], batch.affected([('ns', 'z')]))
+            self.assertEqual(pairs[1:3], batch.affected([('ns',)]))
+            self.assertEqual(pairs[2:3], batch.affected([('ns', 'w')]))
+            self.assertEqual(pairs[2:], batch.affected([('w',)]))
+            self.assertEqual([], batch.affected([('v',)]))
+        finally:
+            rmtree(d)
+
 class TestLoading(TestCase):
 
     def setUp(self):
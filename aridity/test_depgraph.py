@@ -0,0 +1,93 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .config import ConfigCtrl
+from .depgraph import chains, dependencies, dependents, evaluate, topological
+from .model import Text
+from .util import CycleException
+from unittest import TestCase
+
+class TestDepGraph(TestCase):
+
+    def test_dependencies(self):
+        cc = ConfigCtrl()
+        cc.execute('base = x\nhost = api.$(base)\nns\n    port = 80\n    url = $(host):$(port)\n    lower = $lower($(url))\nall = $join($(ns) ,)')
+        graph = dependencies(cc.scope())
+        self.assertEqual([
+            (('base',), ()),
+            (('host',), (('base',),)),
+            (('ns', 'port'), ()),
+            (('ns', 'url'), (('host',), ('ns', 'port'))),
+            (('ns', 'lower'), (('ns', 'url'),)),
+            (('all',), (('ns', 'port'), ('ns', 'url'), ('ns', 'lower'))),
+        ], list(graph.items()))
+        order = topological(graph)
+        for path, deps in graph.items():
+            for dep in deps:
+                self.assertLess(order.index(dep), order.index(path))
+        self.assertEqual((('ns', 'port'), 2), dependents(graph)[0])
+        self.assertEqual([('all',), ('ns', 'lower'), ('ns', 'url'), ('host',), ('base',)], list(chains(graph)[0]))
+        self.assertEqual(dependencies(cc.scope().resolved('ns'))[('url',)], (('port',),))
+
+    def test_evaluate(self):
+        calls = []
+        def f(scope):
+            calls.append(None)
+            return Text('F')
+        cc = ConfigCtrl()
+        cc.put('f', function = f)
+        cc.execute('x = $f()\ny = $(x)y\nz = $(x)$(y)z')
+        values = evaluate(cc.scope())
+        self.assertEqual(['f', 'x', 'y', 'z'], [p for p, in values])
+        self.assertEqual(['F', 'Fy', 'FFyz'], [values[p,].cat() for p in 'xyz'])
+        self.assertEqual(1, len(calls))
+
+    def test_evaluateacrossscopes(self):
+        calls = []
+        def f(scope):
+            calls.append(None)
+            return Text('F')
+        text = '''x = $f()
+ns y = $(x)
+a
+    x = $f()
+    y = $(x)
+    b y = $(x)$(a x)
+v = 1
+w = $(v)
+TOP = $()
+ns
+    v = 2
+    w2 = $(w)
+    top = $(TOP)'''
+        cc = ConfigCtrl()
+        cc.put('f', function = f)
+        cc.execute(text)
+        values = evaluate(cc.scope())
+        self.assertEqual(2, len(calls))
+        expected = ConfigCtrl()
+        expected.put('f', function = f)
+        expected.execute(text)
+        for path in ('ns', 'y'), ('a', 'y'), ('a', 'b', 'y'), ('ns', 'w2'):
+            self.assertEqual(expected.scope().resolved(*path).cat(), values[path].cat())
+            self.assertEqual(values[path].cat(), cc.scope().resolved(*path).cat())
+        self.assertEqual('2', values['ns', 'w2'].cat())
+        self.assertIs(cc.scope().resolved('ns'), values['ns', 'top'])
+
+    def test_cycle(self):
+        with self.assertRaises(CycleException):
+            topological({('x',): (('y',),), ('y',): (('x',),)})
@@ -0,0 +1,91 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .config import ConfigCtrl
+from .fastparser import fastcommandparser, OpenBrackets
+from .grammar import commandparser
+from .model import Scalar
+from .repl import Repl
+from .scope import Scope
+from pyparsing import ParseException
+from random import Random
+from unittest import TestCase
+
+corpus = [
+    'x', 'yy', 'x  y', '\tx  y\t', '\tx  y\r', '$a()', '$a[]', '$ac(x)', '$ac[x]', '$act(x yy)', '$act[x yy]',
+    '$act(\rx  yy\t)', '$act[\rx  yy\t]', '$act(\rx$b()z  yy\t)', '$act(\rx$b[]z  yy\t)', '$act[\rx$b[]z  yy\t]', '$act[\rx$b()z  yy\t]',
+    'woo', 'woo$get(yay)houpla', 'woo $get(\n yay\n)\thoupla  ', '1', '-5', '$id(.1)', '$id(-5.4)', '$id(.1woo)', '100woo',
+    'false', '$id(true)', '$id(falseyay)', 'truewoo', '100$a()', '$aaa($bbb[ccc)ddd])',
+    "$'[$]doesNotExist(]", "$'[$doesNotExist](]", "$'[$doesNotExist(]]", "$'($)doesNotExist[)", "$'($doesNotExist)[)", "$'($doesNotExist[))",
+    "$'[ \t]", "$'[10]", "$'(true)", " $'( x ) ", ' $.( x ) ', " $ '( x ) ", " $' ( x ) ", ' $ .( x ) ', ' $. ( x ) ',
+    '$.( x  y\t)', '$.[ x  y\t]', '$act(x $.[ y\t])', '$.[10]', '$.(x() )', '$.[x() ]',
+    '', 'x=', 'x=  ', 'x = y  z\t', 'x = y\tz  ', 'x=y\nx2=y2', 'x=y\rx2=y2', 'x=y\r\nx2=y2', 'x = true', 'x =true ', 'x = $a(\nb\r)',
+    '$.(100)', '$x$.(100)', '$y$x$.(100)', "$'(100)", "$x$'(100)", "$y$x$'(100)",
+    'a = $lower(ABC(D$(E)F)GHI(JKL)MNO)', 'b = $lower$.( ABC ( D$(E)F ) GHI ( JKL ) MNO )', "c = $lower$'( ABC ( D$(E)F ) GHI ( JKL ) MNO )",
+    'a = $list(100 0100 -100 -0100)', 'e = $list(.0 0. 0.0 00.0 0.00 -.0 -0. -0.0 -00.0 -0.00)',
+    'x = $a(', 'x = $a(\n', 'x = $(', 'x\n  \n ', '$lit(x)', '$literal(x)', '$pass(x)', '$passthrough(x)', '$lit$x()', '$](1\ttrue)',
+]
+
+def _parse(parser, text):
+    try:
+        return parser(text)
+    except ParseException:
+        return ParseException
+
+class TestFastParser(TestCase):
+
+    def _check(self, text):
+        self.assertEqual(_parse(commandparser, text), _parse(fastcommandparser, text), repr(text))
+
+    def test_corpus(self):
+        for text in corpus:
+            self._check(text)
+            self._check(text + '\n')
+
+    def test_random(self):
+        alphabet = ['$', '(', ')', '[', ']', ' ', '\t', '\n', '\r', '\x0c', 'x', '1', '-', '.', "'", 'lit', 'pass', 'true', '=', '$(', '$.(', "$'["]
+        random = Random(0)
+        for _ in range(500):
+            self._check(''.join(random.choice(alphabet) for _ in range(random.randint(0, 16))))
+
+    def test_openbrackets(self):
+        alphabet = ['$', '(', ')', '[', ']', ' ', '\n', 'x', '.', "'", 'lit', '$(', '$.(', "$'[", '$x[', '$x(', '$x$y(']
+        random = Random(0)
+        for _ in range(1000):
+            lines = [''.join(random.choice(alphabet) for _ in range(random.randint(0, 6))) for _ in range(random.randint(1, 4))]
+            openbrackets = OpenBrackets()
+            for i, line in enumerate(lines):
+                if openbrackets.feed(line):
+                    with self.assertRaises(ParseException):
+                        fastcommandparser(''.join(lines[:i + 1]))
+
+    def test_option(self):
+        self.assertIs(commandparser, Repl().parser)
+        s = Scope()
+        s['fastparser',] = Scalar(True)
+        with Repl(s) as repl:
+            self.assertIs(fastcommandparser, repl.parser)
+            repl('woo = $list(')
+            repl('    x $.( y )')
+            repl(')')
+        self.assertEqual(['x', ' y '], s.resolved('woo').unravel())
+
+    def test_configctrl(self):
+        cc = ConfigCtrl()
+        cc.put('fastparser', scalar = True)
+        cc.execute('a b = $lower(ABC(D$(c)F))\nc = E')
+        self.assertEqual('abc(def)', cc.node.a.b)
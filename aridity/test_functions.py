@@ -19,7 +19,7 @@ from .functions import _tomlquote
 from .model import Entry, Function, Locator, Resource, Text
 from .repl import Repl
 from .scope import Scope
-from .util import ispy2, NoSuchPathException
+from .util import ispy2, NoSuchPathException, pure
 from tempfile import NamedTemporaryFile
 from unittest import TestCase
 import os, sys
@@ -339,3 +339,31 @@ class TestFunctions(TestCase):
         self.assertEqual("'woo' 100 200 'yay'", s.resolved('s2').scalar)
         self.assertEqual("'woo' 100 200 'yay'", s.resolved('s1').scalar)
         self.assertEqual("'woo' 100 200 'yay'", s.resolved('s0').scalar)
+
+    def test_pure(self):
+        calls = []
+        scopes = set()
+        @pure
+        def count(scope, resolvable):
+            obj = resolvable.resolve(scope)
+            calls.append(obj)
+            scopes.add(scope)
+            return Text(repr(obj.scalar))
+        s = Scope()
+        s['count',] = Function(count)
+        with Repl(s) as repl:
+            repl('a x = woo')
+            repl('a y = $count($(x))')
+            repl('b x = woo')
+            repl('b y = $count($(x))')
+            repl('c x = 1.0')
+            repl('c y = $count($(x))')
+            repl('d x = 1')
+            repl('d y = $count($(x))')
+        for k in 'a', 'b':
+            self.assertEqual("'woo'", s.resolved(k, 'y').scalar)
+        self.assertEqual([Text('woo')], calls)
+        self.assertEqual("Decimal('1.0')", s.resolved('c', 'y').scalar)
+        self.assertEqual('1', s.resolved('d', 'y').scalar)
+        self.assertEqual(3, len(calls))
+        self.assertEqual({None}, scopes)
@@ -16,11 +16,13 @@
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
 from .config import ConfigCtrl
-from .grammar import GFactory, Parser, ZeroOrMore
+from .grammar import GFactory, LazyParser, Parser
 from .model import Blank, Boolean, Boundary, Call, Concat as ConcatImpl, Entry, nullmonitor, Number, Text
 from decimal import Decimal
 from functools import partial
-from pyparsing import ParseException
+from pyparsing import ParseException, ZeroOrMore
+from threading import Thread
+import time
 from unittest import TestCase
 
 p = expressionparser = Parser(GFactory().create(None), False)
@@ -153,3 +155,20 @@ class TestGrammar(TestCase):
         self.assertEqual(c.split(), list(map(str, conf.c)))
         self.assertEqual(d.split(), list(map(str, conf.d)))
         self.assertEqual(e.split(), list(map(str, conf.e)))
+
+    def test_lazyparser(self):
+        built = []
+        def factory():
+            time.sleep(.1)
+            built.append(None)
+            return Parser(GFactory().create(None), False)
+        lp = LazyParser(factory)
+        self.assertEqual([], built)
+        results = []
+        threads = [Thread(target = lambda: results.append(lp('x'))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([None], built)
+        self.assertEqual([[Text('x')]] * 4, results)
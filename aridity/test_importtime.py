@@ -0,0 +1,49 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .util import ispy2
+from unittest import TestCase
+import os, subprocess, sys, unittest
+
+class TestImportTime(TestCase):
+
+    lazymodules = 'aridity.keyring', 'getpass', 'importlib_metadata', 'json', 'multiprocessing', 'pyparsing', 'shlex', 'subprocess'
+
+    def _importtime(self, module):
+        env = dict(os.environ, PYTHONPATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        stderr = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', "import %s" % module], env = env, stderr = subprocess.STDOUT).decode()
+        micros = {}
+        for line in stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line[len('import time:'):].split('|')
+                if cumulative.strip().isdigit():
+                    micros[name.strip()] = int(cumulative)
+        return micros
+
+    @unittest.skipIf(ispy2, 'No -X importtime.')
+    def test_lazy(self):
+        micros = self._importtime('aridity.config')
+        self.assertIn('aridity.config', micros)
+        for name in self.lazymodules:
+            self.assertNotIn(name, micros)
+
+    def test_firstuse(self):
+        from .config import ConfigCtrl
+        cc = ConfigCtrl()
+        cc.execute('q = $shstr($.(x y))\nj = $jsonquote(x)')
+        self.assertEqual("'x y'", cc.node.q)
+        self.assertEqual('"x"', cc.node.j)
@@ -16,10 +16,12 @@
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
 from .test_grammar import Concat, expressionparser as p
-from .model import Blank, Call, Function, Number, Text
+from .grammar import commandparser
+from .model import Blank, Boolean, Boundary, Call, Concat as ModelConcat, Entry, Function, nullmonitor, Number, Text
 from .scope import Scope
 from .util import allfunctions
 from unittest import TestCase
+import pickle
 
 class Functions:
 
@@ -81,3 +83,26 @@ class TestModel(TestCase):
     def test_join(self):
         call, = p('$join($list(a bb ccc) -)')
         self.assertEqual(Text('a-bb-ccc'), call.resolve(Scope()))
+
+    def test_slots(self):
+        for obj in Text('x'), Number(1), Boolean(True), Blank(' '), Boundary('\n'), Call('x', [], '()'), ModelConcat([], nullmonitor), Entry([]):
+            self.assertFalse(hasattr(obj, '__dict__'), obj)
+            self.assertEqual(obj, pickle.loads(pickle.dumps(obj)))
+
+    def test_eq(self):
+        self.assertEqual(Text('x'), Text('x'))
+        self.assertNotEqual(Text('x'), Text('y'))
+        self.assertNotEqual(Text('1'), Number(1))
+        self.assertNotEqual(Blank(' '), Text(' '))
+        self.assertEqual(hash(Text('x')), hash(Text('x')))
+        self.assertEqual(1, len({Number(1), Number(1)}))
+        self.assertEqual(Call('x', [Text('y')], '()'), Call('x', [Text('y')], '()'))
+        self.assertNotEqual(Call('x', [Text('y')], '()'), Call('x', [Text('y')], '[]'))
+
+    def test_intern(self):
+        e = commandparser('woo = yay  yay\n')
+        f = commandparser('woo = yay  yay\n')
+        self.assertIsNot(e, f)
+        for a, b in zip(e.resolvables, f.resolvables):
+            self.assertIs(a, b)
+        self.assertIs(e.resolvables[4], e.resolvables[6])
@@ -0,0 +1,95 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .config import ConfigCtrl
+from .grammar import commandparser
+from .parsecache import _lines, ParseCache
+from io import StringIO
+from tempfile import mkdtemp
+from unittest import TestCase
+import os, pickle, shutil
+
+class TestParseCache(TestCase):
+
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.cachedir = os.path.join(self.tempdir, 'cache')
+        self.path = os.path.join(self.tempdir, 'conf.arid')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def _load(self):
+        cc = ConfigCtrl()
+        cc.put('parsecache', text = self.cachedir)
+        cc.load(self.path)
+        return cc.node
+
+    def test_warmstart(self):
+        self._write('woo = yay\nthings = $list(\n    x\n    y\n)\nns\n    n = 100\n')
+        conf = self._load()
+        self.assertEqual('yay', conf.woo)
+        self.assertEqual(['x', 'y'], list(conf.things))
+        self.assertEqual(100, conf.ns.n)
+        cachefile, = os.listdir(self.cachedir)
+        with open(os.path.join(self.cachedir, cachefile), 'wb') as f:
+            pickle.dump([commandparser('woo = cached\n')], f)
+        self.assertEqual('cached', self._load().woo)
+
+    def test_contentchange(self):
+        self._write('woo = yay\n')
+        self.assertEqual('yay', self._load().woo)
+        self._write('woo = houpla\n')
+        self.assertEqual('houpla', self._load().woo)
+        self.assertEqual(2, len(os.listdir(self.cachedir)))
+        self.assertEqual('houpla', self._load().woo)
+        self.assertEqual(2, len(os.listdir(self.cachedir)))
+
+    def test_corrupt(self):
+        self._write('woo = yay\n')
+        self._load()
+        cachefile, = os.listdir(self.cachedir)
+        with open(os.path.join(self.cachedir, cachefile), 'wb') as f:
+            f.write(b'junk')
+        self.assertEqual('yay', self._load().woo)
+        with open(os.path.join(self.cachedir, cachefile), 'rb') as f:
+            self.assertEqual([commandparser('woo = yay\n')], pickle.load(f))
+
+    def test_disabled(self):
+        self._write('woo = yay\n')
+        cc = ConfigCtrl()
+        cc.load(self.path)
+        self.assertEqual('yay', cc.node.woo)
+        self.assertFalse(os.path.exists(self.cachedir))
+
+    def test_unwritable(self):
+        self._write('woo = yay\n')
+        self.cachedir = os.path.join(self.path, 'cache')
+        self.assertEqual('yay', self._load().woo)
+        self.cachedir = os.path.join(self.tempdir, 'cache')
+        os.makedirs(ParseCache(self.cachedir)._path('woo = yay\n'))
+        self.assertEqual('yay', self._load().woo)
+        self.assertEqual(1, len(os.listdir(self.cachedir)))
+
+    def test_lines(self):
+        for text in u'', u'a', u'a\n', u'a\n\nb', u'a\r\nb\x0cc\n':
+            self.assertEqual(list(StringIO(text)), list(_lines(text)))
+        self.assertEqual(['a\n', 'b'], list(_lines('a\nb')))
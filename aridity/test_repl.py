@@ -157,3 +157,25 @@ class TestRepl(TestCase):
         with Repl(s) as repl:
             repl.printf('template = %%s')
         self.assertEqual('%s', s.resolved('template').scalar)
+
+    def test_continuationparsedonce(self):
+        texts = []
+        scope = Scope()
+        with Repl(scope) as repl:
+            parser = repl.parser
+            def countingparser(text):
+                texts.append(text)
+                return parser(text)
+            repl.parser = countingparser
+            repl('x = $list(\n')
+            for i in range(10):
+                repl("    $.(%s) $(z)\n" % i)
+            repl(')\n')
+            repl('z = Z\n')
+            repl('y = $list(\n')
+            repl("    $'(\n")
+            repl('    )\n')
+            repl(')\n')
+        self.assertEqual(1 + 1 + 3, len(texts))
+        self.assertEqual([v for i in range(10) for v in [str(i), 'Z']], scope.resolved('x').unravel())
+        self.assertEqual(['\n    '], scope.resolved('y').unravel())
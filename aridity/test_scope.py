@@ -16,10 +16,10 @@
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
 from .test_grammar import loader as l
-from .model import Directive, Stream, Text
+from .model import Directive, Function, Stream, Text
 from .repl import Repl
 from .scope import Scope, StaticScope
-from .util import CycleException, NoSuchPathException
+from .util import CycleException, NoSuchPathException, resolvestate
 from collections import namedtuple
 from tempfile import NamedTemporaryFile
 from unittest import TestCase
@@ -552,3 +552,138 @@ class TestScope(TestCase):
             s.resolved('b')
         self.assertEqual((('b',),), cm.exception.args)
         self.assertIs(s.resolved('y'), s.resolved('y', 'z'))
+
+    def test_memo(self):
+        calls = []
+        def f(scope, resolvable):
+            calls.append(None)
+            return Text(resolvable.resolve(scope).cat().upper())
+        s = Scope()
+        s['f',] = Function(f)
+        with Repl(s) as repl:
+            repl('x = $f($(y))')
+            repl('y = woo')
+            repl('l = $list($f(a) $f(b))')
+        self.assertEqual('WOO', s.resolved('x').scalar)
+        self.assertEqual('WOO', s.resolved('x').scalar)
+        self.assertEqual(1, len(calls))
+        self.assertIs(s.resolved('l'), s.resolved('l'))
+        self.assertEqual(['A', 'B'], s.resolved('l').unravel())
+        self.assertEqual(3, len(calls))
+        self.assertEqual('WOO', s.resolved('x').scalar)
+        self.assertEqual(3, len(calls))
+        s['y',] = Text('yay')
+        self.assertEqual('YAY', s.resolved('x').scalar)
+        self.assertEqual(4, len(calls))
+        s.getorcreatesubscope(['sub'])['y',] = Text('houpla')
+        self.assertEqual('HOUPLA', s.resolved('sub', 'x').scalar)
+        self.assertEqual(5, len(calls))
+
+    def test_memovolatile(self):
+        s = Scope()
+        with NamedTemporaryFile('w') as f:
+            with Repl(s) as repl:
+                repl.printf('x = $readfile(%s)', f.name)
+            self.assertEqual('', s.resolved('x').scalar)
+            f.write('woo')
+            f.flush()
+            self.assertEqual('woo', s.resolved('x').scalar)
+            with s.staticscope().here.push(Text('here1')):
+                self.assertEqual('here1', s.resolved('here').scalar)
+            with s.staticscope().here.push(Text('here2')):
+                self.assertEqual('here2', s.resolved('here').scalar)
+
+    def test_findresolvableearlyexit(self):
+        class Counting(Scope):
+            def resolve(self, scope):
+                resolves.append(self)
+                return self
+        resolves = []
+        parents = []
+        for i in range(100):
+            p = Scope()
+            p['a', 'b'] = Counting()
+            p['a', 'b', 'c'] = Text(i)
+            parents.append(p)
+        s = Scope(parents)
+        self.assertEqual(0, s.resolved('a', 'b', 'c').scalar)
+        self.assertEqual(2, len(resolves)) # To find c and then to resolve it, rather than once per parent.
+
+    def test_reparent(self):
+        a = Scope()
+        a['x',] = Text('a')
+        d = Scope()
+        d['x',] = Text('d')
+        b = a.createchild()
+        c = b.createchild()
+        self.assertEqual('a', c.resolved('x').scalar)
+        self.assertIs(StaticScope, c.staticscope())
+        self.assertIs(c._selfandparents(), c._selfandparents())
+        b.parents = [d]
+        self.assertEqual('d', c.resolved('x').scalar)
+        self.assertEqual([0, 1, 2, 3], [k for k, _ in c._selfandparents()])
+
+    def test_starafterread(self):
+        s = Scope()
+        with Repl(s) as repl:
+            repl('a * b = c')
+            repl('a x d = e')
+        ae = self.assertEqual
+        ae(dict(b = 'c', d = 'e'), s.resolved('a', 'x').unravel())
+        with Repl(s) as repl:
+            repl('a * f g = h')
+            repl('a * b = i')
+        ae(dict(b = 'i', d = 'e', f = dict(g = 'h')), s.resolved('a', 'x').unravel())
+        ae('h', s.resolved('a', 'x', 'f', 'g').unravel())
+        with Repl(s) as repl:
+            repl('a * f j = k')
+        ae(dict(g = 'h', j = 'k'), s.resolved('a', 'x', 'f').unravel())
+
+    def test_compact(self):
+        s = Scope()
+        c = s.createchild()
+        c['x',] = Text('y')
+        self.assertFalse(hasattr(c, '__dict__'))
+        self.assertIsNone(c._threadlocals)
+        self.assertIsNone(c.memo)
+        with self.assertRaises(AttributeError):
+            c.label
+        self.assertEqual('y', c.resolved('x').scalar)
+        self.assertIsNotNone(c.memo)
+        self.assertIs(c.threadlocals, c.threadlocals)
+        self.assertEqual(c, c)
+        self.assertNotEqual(s.createchild(), s.createchild())
+
+    def test_deepacyclic(self):
+        s = Scope()
+        with Repl(s) as repl:
+            repl('a0 = woo')
+            for i in range(1, Scope.cyclecheckdepth * 2):
+                repl("a%s = $(a%s)" % (i, i - 1))
+            repl('x = $(y)')
+            repl('y = $(x)')
+        self.assertEqual('woo', s.resolved("a%s" % (Scope.cyclecheckdepth * 2 - 1)).scalar)
+        with self.assertRaises(CycleException):
+            s.resolved('x')
+        self.assertEqual([], resolvestate.stack)
+
+    def test_duplicate(self):
+        root = Scope()
+        with Repl(root) as repl:
+            repl('app')
+            repl('    x = 1')
+            repl('    a b = 2')
+            repl('    c d = 3')
+        s = root.resolved('app')
+        t = s.duplicate()
+        self.assertIs(s.resolved('a'), t.resolved('a'))
+        t['a', 'b'] = Text('20')
+        s['c', 'd'] = Text('30')
+        t['y',] = Text('4')
+        self.assertEqual({'x': 1, 'a': {'b': 2}, 'c': {'d': '30'}}, s.unravel())
+        self.assertEqual({'x': 1, 'a': {'b': '20'}, 'c': {'d': 3}, 'y': '4'}, t.unravel())
+        self.assertEqual('a', t.resolved('a').label.scalar)
+        u = t.duplicate()
+        u['a', 'e'] = Text('5')
+        self.assertEqual({'b': '20'}, t.resolved('a').unravel())
+        self.assertEqual({'x': 1, 'a': {'b': '20', 'e': '5'}, 'c': {'d': 3}, 'y': '4'}, u.unravel())
@@ -0,0 +1,83 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .config import ConfigCtrl
+from .model import Binary
+from .snapshot import dump, load, SnapshotFormatException, unravel
+from io import BytesIO
+from unittest import TestCase
+
+class TestSnapshot(TestCase):
+
+    def _roundtrip(self, scope):
+        f = BytesIO()
+        dump(scope, f)
+        f.seek(0)
+        return load(f)
+
+    def test_roundtrip(self):
+        cc = ConfigCtrl()
+        cc.execute('''x * sub
+    y = $(a)
+x k a = 100
+x k t = $str(100)
+l = $list(woo true 1.5 $list())
+d
+    e = $list()
+    w = yay''')
+        cc.put('b', resolvable = Binary(b'\x00\x01'))
+        f = self._roundtrip(cc.resolve())
+        self.assertEqual(cc.resolve().unravel(), unravel(f))
+        self.assertEqual(100, f.x.k.a)
+        self.assertEqual('100', f.x.k.t)
+        self.assertEqual(100, f.x.k.sub.y)
+        self.assertEqual(b'\x00\x01', f.b)
+        self.assertEqual([], unravel(f.d.e))
+        self.assertEqual(['woo', True, 1.5, []], unravel(f.l))
+        with self.assertRaises(AttributeError):
+            f.woo = 'yay'
+
+    def test_sharednodes(self):
+        cc = ConfigCtrl()
+        cc.execute('''TOP = $()
+n
+    m
+        o = true
+    p = $(n m)''')
+        f = self._roundtrip(cc.resolve())
+        self.assertIs(f, f.TOP)
+        self.assertIs(f.n.m, f.n.p)
+        self.assertIs(True, f.n.p.o)
+
+    def test_computedscopes(self):
+        cc = ConfigCtrl()
+        cc.execute('\n'.join("k%s = $list(%s %s)" % (i, i, i + 1) for i in range(3000)))
+        f = self._roundtrip(cc.resolve())
+        for i in range(3000):
+            self.assertEqual([i, i + 1], unravel(getattr(f, "k%s" % i)))
+
+    def test_sameasfreeze(self):
+        cc = ConfigCtrl()
+        cc.execute('x = 1\nl = $list(a $list(b))\nd e = $str(1)')
+        cc.put('s', scalar = (1, 'one'))
+        f = self._roundtrip(cc.resolve())
+        self.assertEqual((1, 'one'), f.s)
+        self.assertEqual(unravel(cc.freeze()), unravel(f))
+
+    def test_badmagic(self):
+        with self.assertRaises(SnapshotFormatException):
+            load(BytesIO(b'woo = yay\n'))
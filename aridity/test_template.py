@@ -15,9 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
+from .config import ConfigCtrl
+from .grammar import parsetemplate
 from .model import Function, Stream, Text
 from .repl import Repl
 from .scope import Scope
+from .util import resolvestate, volatile
+from io import StringIO
 from tempfile import NamedTemporaryFile
 from unittest import TestCase
 
@@ -25,8 +29,10 @@ def _blockquote(scope, resolvable):
     indent = scope.resolved('indent').scalar
     return Text(''.join((indent if i else '') + l for i, l in enumerate(resolvable.resolve(scope).scalar.splitlines(True))))
 
-def _processtemplate(scope, path):
-    with open(path) as f:
+def _processtemplate(scope, pathorstream):
+    if hasattr(pathorstream, 'read'):
+        return Stream(pathorstream).processtemplate(scope)
+    with open(pathorstream) as f:
         return Stream(f).processtemplate(scope)
 
 class TestTemplate(TestCase):
@@ -74,3 +80,53 @@ class TestTemplate(TestCase):
     inner=<$(indent)>]''')
             f.flush()
             self.assertEqual('  outer=<  >\n    inner=<    >', _processtemplate(Scope(), f.name))
+
+    def test_parsedonce(self):
+        s = Scope()
+        with Repl(s) as repl:
+            repl('x = X')
+        with NamedTemporaryFile('w') as f, NamedTemporaryFile('w') as g:
+            f.write('  $.[<$(x)$(indent)>\n  $(indent)]')
+            f.flush()
+            g.write("\t$processtemplate(%s)\n\t$processtemplate(%s)" % (f.name, f.name))
+            g.flush()
+            expected = '  <X  >\n    '
+            self.assertEqual(expected, _processtemplate(s, f.name))
+            misses = parsetemplate.misses
+            self.assertEqual(expected, _processtemplate(s, f.name))
+            self.assertEqual("\t%s\n\t%s" % (expected, expected), _processtemplate(s, g.name))
+            self.assertEqual(misses + 1, parsetemplate.misses)
+
+    def test_streaming(self):
+        written = []
+        def seen(scope):
+            written.append(g.getvalue())
+            return Text('!')
+        s = Scope()
+        s['seen',] = Function(seen)
+        with Repl(s) as repl:
+            repl('x = X')
+        with NamedTemporaryFile('w') as f:
+            f.write('head $(x)\n  $(indent)$seen() tail')
+            f.flush()
+            g = StringIO()
+            ConfigCtrl(s).processtemplate(f.name, g)
+            self.assertEqual('head X\n    ! tail', g.getvalue())
+            self.assertEqual(['head X\n  '], written)
+            self.assertEqual(g.getvalue(), _processtemplate(s, f.name))
+
+    def test_callmemo(self):
+        calls = []
+        def count(scope, resolvable):
+            calls.append(resolvable.resolve(scope).cat())
+            return Text(calls[-1].upper())
+        s = Scope()
+        s['count',] = Function(count)
+        s['volatilecount',] = Function(volatile(lambda *args: count(*args)))
+        with Repl(s) as repl:
+            repl('x = woo')
+            repl('y sub = $count($(x))')
+        text = '$count($(x)) $count($(x)) $count(yay) $(y sub)\n  $count($(indent))$count($(indent))\n$volatilecount($(x))$volatilecount($(x))'
+        self.assertEqual('WOO WOO YAY WOO\n      \nWOOWOO', _processtemplate(s, StringIO(text)))
+        self.assertEqual(['woo', 'yay', 'woo', '  ', '  ', 'woo', 'woo'], calls)
+        self.assertIsNone(resolvestate.callmemo)
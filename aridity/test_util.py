@@ -18,7 +18,7 @@
 from .config import ConfigCtrl
 from .repl import Repl
 from .scope import Scope
-from .util import ispy2, openresource, TreeNoSuchPathException
+from .util import boundedmemo, ispy2, openresource, TreeNoSuchPathException
 from unittest import TestCase
 
 class TestUtil(TestCase):
@@ -56,3 +56,18 @@ class TestUtil(TestCase):
             f.read()
         with openresource(__package__, 'test_util/resource.utf8', 'utf-8') as f:
             self.assertEqual(u'\N{POUND SIGN}\n', f.read())
+
+    def test_boundedmemo(self):
+        calls = []
+        @boundedmemo(2)
+        def f(x):
+            calls.append(x)
+            return [x]
+        self.assertIs(f(1), f(1))
+        f(2)
+        self.assertEqual([1, 2], calls)
+        f(3)
+        f(2)
+        f(1)
+        self.assertEqual([1, 2, 3, 2, 1], calls)
+        self.assertEqual(5, f.misses)
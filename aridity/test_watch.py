@@ -0,0 +1,103 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+from .config import ConfigCtrl
+from .watch import Inotify
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event
+from unittest import TestCase
+import os, sys, unittest
+
+class TestWatch(TestCase):
+
+    def setUp(self):
+        self.d = mkdtemp()
+        self.a = self._write('a.arid', "x = 1\n. %s\n" % os.path.join(self.d, 'b.arid'))
+        self._write('b.arid', 'y = 2\n')
+        self._write('c.txt', 'unrelated')
+
+    def tearDown(self):
+        rmtree(self.d)
+
+    def _write(self, name, text):
+        path = os.path.join(self.d, name)
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.rename(path + '.tmp', path) # Like an editor.
+        return path
+
+    def _check(self, polling):
+        cc = ConfigCtrl()
+        cc.put('z', number = 3)
+        changes = []
+        reloaded = Event()
+        def callback(changed):
+            changes.append(changed)
+            reloaded.set()
+        config = cc.node
+        watcher = cc.watcher(callback, debounce = .05, interval = .05, polling = polling)
+        watcher.load(self.a)
+        self.assertEqual((1, 2, 3), (config.x, config.y, config.z))
+        with watcher:
+            self._write('c.txt', 'still unrelated')
+            self._write('b.arid', 'y = 20\nw = 4\n')
+            self.assertTrue(reloaded.wait(5))
+        self.assertEqual([[os.path.join(self.d, 'b.arid')]], changes)
+        self.assertEqual((1, 20, 3, 4), (config.x, config.y, config.z, config.w))
+
+    def test_polling(self):
+        self._check(True)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'inotify')
+    def test_inotify(self):
+        Inotify().close()
+        self._check(False)
+
+    def test_childnode(self):
+        for prefix in [], ['app']:
+            cc = ConfigCtrl()
+            ctrl = ConfigCtrl(cc.basescope, prefix)
+            cc.execute(' '.join(prefix + ['db host = h0']))
+            db = ctrl.node.db
+            watcher = ctrl.watcher()
+            self._write('a.arid', 'db host = h1\n')
+            watcher.load(self.a)
+            self.assertEqual('h1', db.host)
+            self._write('a.arid', 'db host = h2\n')
+            watcher.reload()
+            self.assertEqual('h2', ctrl.node.db.host)
+            self.assertEqual('h2', db.host)
+
+    def test_unstarted(self):
+        watcher = ConfigCtrl().watcher()
+        watcher.load(self.a)
+        self.assertIsNone(watcher.backend)
+        watcher.stop()
+        with watcher:
+            self.assertIsNotNone(watcher.backend)
+        self.assertIsNone(watcher.backend)
+        watcher.stop()
+
+    def test_badreload(self):
+        cc = ConfigCtrl()
+        watcher = cc.watcher()
+        watcher.load(self.a)
+        self._write('b.arid', 'y = $(\n')
+        with self.assertRaises(Exception):
+            watcher.reload()
+        self.assertEqual(2, cc.node.y)
@@ -15,8 +15,9 @@
 # You should have received a copy of the GNU General Public License
 # along with aridity.  If not, see <http://www.gnu.org/licenses/>.
 
-from importlib_metadata import entry_points
-import collections, inspect, sys
+from contextlib import contextmanager
+from functools import wraps
+import collections, inspect, sys, threading
 
 dotpy = '.py'
 ispy2 = sys.version_info.major < 3
@@ -100,6 +101,98 @@ class OrderedDict(OrderedDictWrapper):
     def update(self, other):
         return self.d.update(other)
 
+class ResolveState(threading.local):
+
+    taint = 0 # Incremented by anything whose result may change while the config does not.
+    callmemo = None # Results of calls in the template being rendered, if any.
+    reads = None # Paths resolved while recording, if any.
+    sources = None # Files sourced while recording, if any.
+
+    def __init__(self):
+        self.stack = [] # Scope and path of each resolution in progress on this thread.
+
+resolvestate = ResolveState()
+
+def taint():
+    resolvestate.taint += 1
+
+def resolving(frame, iterable):
+    'Yield from iterable with the given frame on the resolution stack while each item is computed, so that scratch writes are not taken for config changes.'
+    stack = resolvestate.stack
+    i = iter(iterable)
+    while True:
+        stack.append(frame) # Not while the caller has the item, as it may write to the config.
+        try:
+            obj = next(i, resolving)
+        finally:
+            stack.pop()
+        if obj is resolving:
+            break
+        yield obj
+
+@contextmanager
+def memoizecalls():
+    'Share the result of each distinct call in a given scope until exit, unless it was tainted.'
+    if resolvestate.callmemo is not None:
+        yield
+        return
+    resolvestate.callmemo = {}
+    try:
+        yield
+    finally:
+        resolvestate.callmemo = None
+
+@contextmanager
+def recordreads():
+    'Collect the path of every resolution until exit, bypassing memos so that nothing is missed.'
+    outer = resolvestate.reads
+    reads = resolvestate.reads = set()
+    try:
+        yield reads
+    finally:
+        resolvestate.reads = outer
+        if outer is not None:
+            outer.update(reads)
+
+@contextmanager
+def recordsources():
+    'Collect the path of every file sourced until exit.'
+    outer = resolvestate.sources
+    sources = resolvestate.sources = set()
+    try:
+        yield sources
+    finally:
+        resolvestate.sources = outer
+        if outer is not None:
+            outer.update(sources)
+
+def boundedmemo(maxsize):
+    'Like lru_cache, which Python 2 lacks, except that everything is forgotten when full.'
+    def decorator(f):
+        @wraps(f)
+        def g(*args):
+            try:
+                return cache[args]
+            except KeyError:
+                pass
+            g.misses += 1
+            if len(cache) >= maxsize:
+                cache.clear()
+            return cache.setdefault(args, f(*args)) # Concurrent callers agree on the value.
+        cache = {}
+        g.misses = 0
+        return g
+    return decorator
+
+def volatile(f):
+    f.volatile = True
+    return f
+
+def pure(f):
+    'The result depends only on the resolved arguments, which will be passed in place of the originals, along with None for the scope.'
+    f.pure = True
+    return f
+
 def realname(name):
     def apply(f):
         f.realname = name
@@ -122,6 +215,11 @@ def solo(v):
     x, = v
     return x
 
+def overlaps(p, q):
+    'True if either path is a prefix of the other.'
+    n = min(len(p), len(q))
+    return p[:n] == q[:n]
+
 def qualname(obj):
     try:
         return obj.__qualname__
@@ -132,6 +230,7 @@ def qualname(obj):
         return name
 
 def selectentrypoints(group):
+    from importlib_metadata import entry_points
     obj = entry_points()
     try:
         select = obj.select
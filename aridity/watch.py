@@ -0,0 +1,196 @@
+# Copyright 2017, 2020 Andrzej Cichocki
+
+# This file is part of aridity.
+#
+# aridity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# aridity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with aridity.  If not, see <http://www.gnu.org/licenses/>.
+
+'Reload config when any file it was sourced from changes.'
+from .model import Entry, Locator
+from .scope import generation
+from .util import recordsources, solo
+import logging, os, select, struct, sys, threading, time
+
+log = logging.getLogger(__name__)
+
+class Inotify:
+    'Report changes to files in watched directories using the Linux inotify API, so that files replaced by editors are still noticed.'
+
+    mask = 0x8 | 0x40 | 0x80 | 0x100 | 0x200 # IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE and IN_DELETE.
+    eventheader = struct.Struct('iIII')
+
+    def __init__(self):
+        import ctypes, ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+        self.dirs = {}
+
+    def track(self, paths):
+        for dirpath in set(os.path.dirname(p) for p in paths) - set(self.dirs.values()):
+            wd = self.libc.inotify_add_watch(self.fd, dirpath.encode(sys.getfilesystemencoding()), self.mask)
+            if wd < 0:
+                log.warning("Failed to watch: %s", dirpath)
+            else:
+                self.dirs[wd] = dirpath
+
+    def read(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        data = os.read(self.fd, 65536)
+        paths = set()
+        pos = 0
+        while pos < len(data):
+            wd, _, _, n = self.eventheader.unpack_from(data, pos)
+            pos += self.eventheader.size
+            name = data[pos:pos + n].rstrip(b'\0').decode(sys.getfilesystemencoding())
+            pos += n
+            if wd in self.dirs:
+                paths.add(os.path.join(self.dirs[wd], name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+class Poller:
+    'Portable fallback that compares the stat of every tracked file after each timeout.'
+
+    def __init__(self):
+        self.stats = {}
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        return st.st_mtime, st.st_size, st.st_ino
+
+    def track(self, paths):
+        for path in paths:
+            if path not in self.stats:
+                self.stats[path] = self._stat(path)
+
+    def read(self, timeout):
+        time.sleep(timeout)
+        paths = set()
+        for path, stat in list(self.stats.items()):
+            newstat = self._stat(path)
+            if newstat != stat:
+                self.stats[path] = newstat
+                paths.add(path)
+        return paths
+
+    def close(self):
+        pass
+
+def _backend(polling):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return Inotify()
+        except (AttributeError, OSError) as e:
+            log.warning("Falling back to polling: %s", e)
+    return Poller()
+
+class Watcher:
+    '''Load config files into the given ctrl and reload them when any file they sourced changes, see start.
+    A reload starts again from the config as it was when the watcher was created, so anything else written to it since is lost.'''
+
+    def __init__(self, ctrl, callback = None, debounce = .1, interval = .5, polling = False):
+        self.ctrl = ctrl
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self.baseline = ctrl.scope(True).duplicate()
+        self.loads = []
+        self.sources = set()
+        self.polling = polling
+        self.backend = None
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def load(self, path):
+        'Like ConfigCtrl load but remember the path, which must not be a stream.'
+        with recordsources() as sources:
+            self.ctrl.load(path)
+        self.loads.append(path)
+        self._track(sources)
+
+    def _track(self, sources):
+        self.sources.update(sources)
+        if self.backend is not None:
+            self.backend.track(sources)
+
+    def start(self):
+        'Watch the sourced files from now on in a daemon thread, until stop.'
+        self.backend = _backend(self.polling)
+        self.backend.track(self.sources)
+        self.stopping.clear()
+        self.thread = threading.Thread(target = self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+        self.backend.close()
+        self.backend = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _changed(self, timeout):
+        return self.backend.read(timeout) & self.sources
+
+    def _run(self):
+        while not self.stopping.is_set():
+            changed = self._changed(self.interval)
+            if changed:
+                while True: # Wait for the writes to settle.
+                    more = self._changed(self.debounce)
+                    if not more:
+                        break
+                    changed |= more
+                try:
+                    self.reload()
+                except Exception:
+                    log.exception('Failed to reload, keeping the current config:')
+                    continue
+                if self.callback is not None:
+                    self.callback(sorted(changed))
+
+    def reload(self):
+        'Source every loaded file again in order, as later files may depend on earlier ones, then swap the result in for the current scope.'
+        old = self.ctrl.scope(True)
+        fresh = self.baseline.duplicate()
+        try:
+            fresh.label = old.label
+        except AttributeError:
+            pass
+        with recordsources() as sources:
+            for path in self.loads:
+                Locator(path).source(fresh, Entry([]))
+        if self.ctrl.prefix: # Either way readers see the old config or the new one, never a mixture.
+            solo(fresh.parents)[self.ctrl.prefix[-1],] = fresh
+        else: # Keep the root scope, as ctrls of existing child nodes refer to it.
+            fresh.resolvables.scope = old
+            old.resolvables = fresh.resolvables
+            generation.bump()
+        self._track(sources)